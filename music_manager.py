@@ -1,554 +1,1744 @@
 # Music Manager v2.0 20250414.07:45
-import os, json, subprocess, tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from mutagen import File
+import os, re, sys, json, time, pickle, hashlib, sqlite3, argparse, threading
+from bisect import bisect_left, bisect_right, insort
+from collections import deque, OrderedDict
+from stat import S_ISREG
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import music_manager_logger
-from music_manager_logger import log_error, log_debug
+from music_manager_logger import log_error, log_debug, log_sampled
+import music_manager_metrics
+from music_manager_metrics import span, timed
 
 DB_FILENAME = "/home/coder/bin/Python/Music_Manager/music_db.json"
+DB_BACKEND = "json"
+SQLITE_FILENAME = "/home/coder/bin/Python/Music_Manager/music_db.sqlite"
+NDJSON_FILENAME = "/home/coder/bin/Python/Music_Manager/music_db.ndjson"
+INDEX_FILENAME = "/home/coder/bin/Python/Music_Manager/music_db.index"
+PERSIST_INDEX = False
+META_CACHE_FILENAME = "/home/coder/bin/Python/Music_Manager/music_meta.cache"
+META_CACHE_SIZE = 20000
+PERSIST_META_CACHE = False
+ROOTS_FILENAME = "/home/coder/bin/Python/Music_Manager/music_roots.json"
+WATCH_INTERVAL = 5.0
+WATCH_DEBOUNCE = 2.0
+WATCH_PRUNE_LIMIT = 10
+SEARCH_FIELDS = ("artist", "title", "album", "file_name")
+NUMERIC_FIELDS = ("file_size", "tracknumber")
+QUERY_FIELDS = {"artist": "artist", "title": "title", "album": "album", "name": "file_name", "file_name": "file_name",
+                "path": "full_path", "full_path": "full_path", "size": "file_size", "file_size": "file_size",
+                "track": "tracknumber", "tracknumber": "tracknumber"}
 EXTS = ('.mp3', '.ogg', '.oga', '.flac')
-PLAYME_SCRIPT = "/home/coder/bin/Python/PlayMe/playme.py"
+IMPORT_WORKERS = 8
+IMPORT_BATCH = 200
+WRITE_WORKERS = 4
+HASH_WORKERS = 8
+HASH_CHUNK = 64 * 1024
+VERIFY_WORKERS = 16
+TAG_FIELDS = ("artist", "title", "album", "tracknumber")
+LOAD_BATCH = 2000
+LOAD_CHUNK = 1 << 20
+JOURNAL_COMPACT_BYTES = 4 << 20
 
+class Record:
+    """Compact catalog record with the dict-style access the rest of the app uses.
+
+    Fields live in __slots__, artist/album/tracknumber strings are interned, file sizes are ints,
+    and full_path is the same string object as the catalog key. file_name is only stored when it
+    differs from the path's basename. Fields set to None read as missing.
+    """
+    __slots__ = ("artist", "title", "album", "tracknumber", "file_size", "name", "path",
+                 "mtime", "inode", "dirty", "hashes", "extra")
+    FIELDS = ("artist", "title", "album", "tracknumber", "file_size", "file_name", "full_path",
+              "mtime", "inode", "dirty", "hashes")
+    INTERNED = ("artist", "album", "tracknumber")
+    PLAIN = ("title", "mtime", "inode", "dirty", "hashes")
+
+    def __init__(self, data=(), path=None):
+        d = dict(data)
+        full = d.pop("full_path", None)
+        self.path = full if path is None else path
+        intern = sys.intern
+        v = d.pop("artist", None)
+        self.artist = intern(v) if type(v) is str else v
+        v = d.pop("album", None)
+        self.album = intern(v) if type(v) is str else v
+        v = d.pop("tracknumber", None)
+        self.tracknumber = intern(v) if type(v) is str else v
+        self.title = d.pop("title", None)
+        self.mtime = d.pop("mtime", None)
+        self.inode = d.pop("inode", None)
+        self.dirty = d.pop("dirty", None)
+        self.hashes = d.pop("hashes", None)
+        self.file_size = self.name = self.extra = None
+        v = d.pop("file_size", None)
+        if type(v) is int:
+            self.file_size = v
+        elif v is not None:
+            self["file_size"] = v
+        v = d.pop("file_name", None)
+        if v is not None and not (self.path and self.path.endswith(v) and v == os.path.basename(self.path)):
+            self.name = v
+        for k, v in d.items():
+            self[k] = v
+
+    def __setitem__(self, k, v):
+        if k == "full_path":
+            self.path = v
+        elif k == "file_name":
+            self.name = None if self.path and v == os.path.basename(self.path) else v
+        elif k == "file_size":
+            try:
+                self.file_size = int(v)
+            except (TypeError, ValueError):
+                self.file_size = v or None
+        elif k in self.INTERNED:
+            setattr(self, k, sys.intern(v) if type(v) is str else v)
+        elif k in self.PLAIN:
+            setattr(self, k, v)
+        elif v is None:
+            if self.extra:
+                self.extra.pop(k, None)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[k] = v
+
+    def get(self, k, default=None):
+        if k == "full_path":
+            v = self.path
+        elif k == "file_name":
+            v = self.name if self.name is not None or self.path is None else os.path.basename(self.path)
+        elif k in self.INTERNED or k in self.PLAIN or k == "file_size":
+            v = getattr(self, k)
+        else:
+            v = self.extra.get(k) if self.extra else None
+        return default if v is None else v
+
+    def __getitem__(self, k):
+        v = self.get(k)
+        if v is None:
+            raise KeyError(k)
+        return v
+
+    def __contains__(self, k):
+        return self.get(k) is not None
+
+    def keys(self):
+        return [k for k in self.FIELDS if self.get(k) is not None] + list(self.extra or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self.get(k)) for k in self.keys()]
+
+    def values(self):
+        return [self.get(k) for k in self.keys()]
+
+    def pop(self, k, default=None):
+        v = self.get(k)
+        if v is None:
+            return default
+        self[k] = None
+        return v
+
+    def update(self, other=(), **kw):
+        for k, v in (other.items() if hasattr(other, "items") else other):
+            self[k] = v
+        for k, v in kw.items():
+            self[k] = v
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return hasattr(other, "keys") and self.to_dict() == dict(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+class RecordStore(dict):
+    """Catalog mapping of full_path to Record. Assigned dicts are converted, and each record shares its key string.
+
+    Paths are deliberately not split into interned directory + basename: the full-path key is also the
+    Treeview iid and is held by SearchIndex, SortIndex, the journal and json.dump. Rebuilding it on access
+    would give each of those its own copy and cost more memory than the shared prefix saves.
+    """
+    def __setitem__(self, key, rec):
+        if type(rec) is Record:
+            rec.path = key
+        else:
+            rec = Record(rec, key)
+        super().__setitem__(key, rec)
+
+    def update(self, other=(), **kw):
+        for k, v in (other.items() if hasattr(other, "items") else other):
+            self[k] = v
+        for k, v in kw.items():
+            self[k] = v
+
+def to_store(db):
+    store = RecordStore()
+    store.update(db)
+    return store
+
+def record_json(obj):
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def db_path():
+    return {"sqlite": SQLITE_FILENAME, "ndjson": NDJSON_FILENAME}.get(DB_BACKEND, DB_FILENAME)
+
+def journal_path(path=None):
+    return (path or db_path()) + ".journal"
+
+@timed("load_db")
 def load_db():
+    """Load the catalog. Raises OSError/ValueError if it exists but cannot be read, rather than returning {}."""
+    if DB_BACKEND == "sqlite":
+        return load_sqlite()
+    if DB_BACKEND == "ndjson":
+        return load_ndjson()
+    return load_json()
+
+@timed("save_db")
+def save_db(db, changed=None, removed=None):
+    """Persist db. For json/ndjson, known changed/removed keys are appended to the journal, and a full
+    snapshot is only written when no keys are given, the batch is large or the journal is due for compaction."""
+    if DB_BACKEND == "sqlite":
+        save_sqlite(db, changed, removed)
+        return
+    if changed is None and removed is None:
+        compact_db(db)
+        return
+    count = len(changed or ()) + len(removed or ())
+    if not count:
+        return
+    if count >= len(db) // 2 or not os.path.exists(db_path()):
+        compact_db(db)
+        return
+    try:
+        append_journal(db, changed, removed)
+    except Exception as e:
+        log_error("Error appending to journal, writing a full snapshot instead: %s", e)
+        compact_db(db)
+        return
+    if journal_due():
+        compact_db(db)
+
+def compact_db(db):
+    if DB_BACKEND == "ndjson":
+        save_ndjson(db)
+    else:
+        save_json(db)
+
+def atomic_write(path, write):
+    """Write path through a temp file in the same directory: write(f), fsync, then rename over the old file."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        log_debug("Could not fsync directory of %s: %s", path, e)
+
+def append_journal(db, changed, removed):
+    """Append one line per key ({"key": k, "rec": {...}} or {"key": k} for a delete) and fsync."""
+    keys = dict.fromkeys(list(changed or ()) + list(removed or ()))
+    data = "".join(json.dumps({"key": k, "rec": db[k]} if k in db else {"key": k}, separators=(",", ":"),
+                              default=record_json) + "\n" for k in keys)
+    path = journal_path()
+    with open(path, 'a+b') as f:
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(data.encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+    log_debug("Journaled %s change(s) to %s", len(keys), path)
+
+def read_journal(path):
+    """Return {key: record dict, or None for a delete} from the journal of path, later lines winning.
+    Unreadable lines (a torn append from a crash) are skipped."""
+    ops = {}
+    jp = journal_path(path)
+    if not os.path.exists(jp):
+        return ops
+    with open(jp, 'r', encoding='utf-8', errors='replace') as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                ops[entry["key"]] = entry.get("rec")
+            except (ValueError, KeyError, TypeError) as e:
+                log_error("Skipping unreadable line %s of %s: %s", n, jp, e)
+    log_debug("Read %s journaled change(s) from %s", len(ops), jp)
+    return ops
+
+def replay_journal(db, ops):
+    for key, rec in ops.items():
+        if rec is None:
+            db.pop(key, None)
+        else:
+            db[key] = rec
+    return db
+
+def drop_journal(path):
+    try:
+        os.remove(journal_path(path))
+        log_debug("Journal of %s compacted into the snapshot", path)
+    except FileNotFoundError:
+        pass
+
+def journal_due():
+    try:
+        size = os.path.getsize(journal_path())
+    except OSError:
+        return False
+    try:
+        snapshot = os.path.getsize(db_path())
+    except OSError:
+        snapshot = 0
+    return size > max(JOURNAL_COMPACT_BYTES, snapshot // 2)
+
+def stream_db(progress=None):
+    """Yield the catalog in batches of (key, Record) pairs as it is parsed, for progressive startup.
+
+    progress, when given, gets "found" set to the file size and "done" to the bytes read so far.
+    Missing files and pending migrations fall back to load_db and a single batch. Journaled keys are
+    held back from the snapshot batches and sent last with their replayed records.
+    """
+    path = db_path()
+    if not os.path.exists(path) or DB_BACKEND == "sqlite":
+        db = load_db()
+        if progress is not None:
+            progress["found"] = progress["done"] = len(db)
+        yield list(db.items())
+        return
+    ops = read_journal(path)
+    if progress is not None:
+        progress["found"] = os.path.getsize(path)
+    for batch in (stream_ndjson if DB_BACKEND == "ndjson" else stream_json)(path, progress):
+        yield [(k, r) for k, r in batch if k not in ops] if ops else batch
+    yield [(k, Record(r, k)) for k, r in ops.items() if r is not None]
+
+def stream_json(path, progress=None):
+    """Parse a {"full_path": {...}, ...} catalog incrementally with raw_decode, one record at a time."""
+    decoder = json.JSONDecoder()
+    ws = re.compile(r"[ \t\n\r]*")
+    buf, pos, started, batch = "", 0, False, []
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            try:
+                p = ws.match(buf, pos).end()
+                if not started:
+                    if buf[p] != "{":
+                        raise ValueError(f"{path} is not a JSON object")
+                    started, pos = True, p + 1
+                    continue
+                if buf[p] == "}":
+                    break
+                if buf[p] == ",":
+                    p = ws.match(buf, p + 1).end()
+                key, p = decoder.raw_decode(buf, p)
+                p = ws.match(buf, p).end()
+                if buf[p] != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", buf, p)
+                rec, p = decoder.raw_decode(buf, ws.match(buf, p + 1).end())
+            except (IndexError, json.JSONDecodeError) as e:
+                chunk = f.read(LOAD_CHUNK)
+                if not chunk:
+                    raise ValueError(f"{path} is truncated or malformed: {e}") from e
+                buf, pos = buf[pos:] + chunk, 0
+                if progress is not None:
+                    progress["done"] += len(chunk)
+                continue
+            batch.append((key, Record(rec, key)))
+            pos = p
+            if len(batch) >= LOAD_BATCH:
+                yield batch
+                batch = []
+    if progress is not None:
+        progress["done"] = progress["found"]
+    yield batch
+
+def stream_ndjson(path, progress=None):
+    """Parse a catalog stored as one compact JSON record per line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            lines = [line for line in islice(f, LOAD_BATCH) if line.strip()]
+            if not lines:
+                break
+            if progress is not None:
+                progress["done"] += sum(map(len, lines))
+            yield [(rec["full_path"], Record(rec)) for rec in json.loads("[" + ",".join(lines) + "]")]
+    if progress is not None:
+        progress["done"] = progress["found"]
+    yield []
+
+def load_json():
     log_debug("Attempting to load database.")
-    if not os.path.exists(DB_FILENAME):
-        log_debug(f"{DB_FILENAME} does not exist. Creating new db.")
-        save_db({})
+    db = RecordStore()
     try:
-        with open(DB_FILENAME, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-            log_debug(f"Database loaded successfully with {len(db)} record(s).")
-            return db
+        if os.path.exists(DB_FILENAME):
+            for batch in stream_json(DB_FILENAME):
+                db.update(batch)
+        else:
+            log_debug("%s does not exist. Starting a new db.", DB_FILENAME)
+        replay_journal(db, read_journal(DB_FILENAME))
     except Exception as e:
-        log_error(f"Error loading db: {e}")
-        return {}
+        log_error("Error loading db: %s", e)
+        raise
+    log_debug("Database loaded successfully with %s record(s).", len(db))
+    return db
 
-def save_db(db):
+def save_json(db):
     log_debug("Attempting to save database.")
     try:
-        with open(DB_FILENAME, 'w', encoding='utf-8') as f:
-            json.dump(db, f, indent=4)
+        atomic_write(DB_FILENAME, lambda f: json.dump(db, f, indent=4, default=record_json))
+        drop_journal(DB_FILENAME)
+        log_debug("Database saved successfully.")
+    except Exception as e:
+        log_error("Error saving db: %s", e)
+
+def load_ndjson():
+    log_debug("Attempting to load NDJSON database: %s", NDJSON_FILENAME)
+    if not os.path.exists(NDJSON_FILENAME):
+        if os.path.exists(DB_FILENAME):
+            log_debug("Migrating %s into %s", DB_FILENAME, NDJSON_FILENAME)
+            db = load_json()
+        else:
+            log_debug("%s does not exist. Creating new db.", NDJSON_FILENAME)
+            db = RecordStore()
+        save_ndjson(db)
+        return db
+    db = RecordStore()
+    try:
+        for batch in stream_ndjson(NDJSON_FILENAME):
+            db.update(batch)
+        replay_journal(db, read_journal(NDJSON_FILENAME))
+    except Exception as e:
+        log_error("Error loading NDJSON db: %s", e)
+        raise
+    log_debug("Database loaded successfully with %s record(s).", len(db))
+    return db
+
+def save_ndjson(db):
+    log_debug("Attempting to save NDJSON database.")
+
+    def write(f):
+        for rec in db.values():
+            f.write(json.dumps(rec, separators=(",", ":"), default=record_json) + "\n")
+
+    try:
+        atomic_write(NDJSON_FILENAME, write)
+        drop_journal(NDJSON_FILENAME)
         log_debug("Database saved successfully.")
     except Exception as e:
-        log_error(f"Error saving db: {e}")
+        log_error("Error saving NDJSON db: %s", e)
+
+def open_sqlite(path=None):
+    conn = sqlite3.connect(path or SQLITE_FILENAME)
+    conn.execute("CREATE TABLE IF NOT EXISTS records (full_path TEXT PRIMARY KEY, artist TEXT, title TEXT, album TEXT, data TEXT NOT NULL)")
+    for col in ("artist", "album", "title"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_records_{col} ON records({col})")
+    return conn
+
+def sqlite_row(key, rec):
+    return (key, rec.get("artist", ""), rec.get("title", ""), rec.get("album", ""), json.dumps(rec, default=record_json))
+
+def load_sqlite():
+    log_debug("Attempting to load SQLite database: %s", SQLITE_FILENAME)
+    if not os.path.exists(SQLITE_FILENAME) and os.path.exists(DB_FILENAME):
+        return migrate_sqlite()
+    try:
+        conn = open_sqlite()
+    except Exception as e:
+        log_error("Error opening SQLite db: %s", e)
+        raise
+    try:
+        db = RecordStore()
+        for k, data in conn.execute("SELECT full_path, data FROM records"):
+            db[k] = json.loads(data)
+        log_debug("Database loaded successfully with %s record(s).", len(db))
+        return db
+    except Exception as e:
+        log_error("Error loading SQLite db: %s", e)
+        raise
+    finally:
+        conn.close()
+
+def migrate_sqlite():
+    """Copy the JSON catalog into a temp database and rename it into place only once it is complete,
+    so a failed or interrupted migration is retried instead of leaving an empty SQLITE_FILENAME."""
+    log_debug("Migrating %s into %s", DB_FILENAME, SQLITE_FILENAME)
+    tmp = SQLITE_FILENAME + ".tmp"
+    try:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        db = load_json()
+        conn = open_sqlite(tmp)
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                                 (sqlite_row(k, r) for k, r in db.items()))
+        finally:
+            conn.close()
+        os.replace(tmp, SQLITE_FILENAME)
+    except Exception as e:
+        log_error("Error migrating to SQLite db: %s", e)
+        raise
+    log_debug("Migrated %s record(s) to SQLite.", len(db))
+    return db
+
+def save_sqlite(db, changed=None, removed=None):
+    log_debug("Attempting to save SQLite database (changed=%s, removed=%s).",
+              None if changed is None else len(changed), None if removed is None else len(removed))
+    try:
+        conn = open_sqlite()
+    except Exception as e:
+        log_error("Error opening SQLite db: %s", e)
+        return
+    try:
+        with conn:
+            if changed is None and removed is None:
+                stale = [(k,) for (k,) in conn.execute("SELECT full_path FROM records") if k not in db]
+                conn.executemany("DELETE FROM records WHERE full_path = ?", stale)
+                changed = list(db)
+            gone = [(k,) for k in (removed or ()) if k not in db]
+            gone += [(k,) for k in (changed or ()) if k not in db]
+            conn.executemany("DELETE FROM records WHERE full_path = ?", gone)
+            conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                             (sqlite_row(k, db[k]) for k in (changed or ()) if k in db))
+        log_debug("Database saved successfully.")
+    except Exception as e:
+        log_error("Error saving SQLite db: %s", e)
+    finally:
+        conn.close()
+
+class MetaCache:
+    """Bounded, thread-safe LRU of parsed tags. Entries are only served while the file's (mtime, size) still match."""
+    def __init__(self, size=META_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, fp, st):
+        with self.lock:
+            entry = self.entries.get(fp)
+            if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(fp)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, fp, st, meta):
+        with self.lock:
+            self.entries[fp] = (st.st_mtime_ns, st.st_size, dict(meta))
+            self.entries.move_to_end(fp)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, fp):
+        with self.lock:
+            self.entries.pop(fp, None)
+
+    def save(self, path):
+        log_debug("Saving metadata cache (%s entries, %s hits, %s misses) to %s",
+                  len(self.entries), self.hits, self.misses, path)
+        try:
+            with self.lock:
+                entries = list(self.entries.items())
+            with open(path + ".tmp", 'wb') as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            log_error("Error saving metadata cache: %s", e)
+
+    def load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                entries = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log_error("Error loading metadata cache: %s", e)
+            return
+        with self.lock:
+            self.entries = OrderedDict(entries[-self.size:])
+        log_debug("Metadata cache loaded from %s with %s entries", path, len(self.entries))
+
+META_CACHE = MetaCache()
 
-def extract_meta(fp):
-    log_debug(f"Extracting metadata from file: {fp}")
+@timed("extract_meta")
+def extract_meta(fp, st=None):
+    key = os.path.abspath(fp)
+    try:
+        st = st or os.stat(fp)
+    except OSError:
+        st = None
+    meta = META_CACHE.get(key, st) if st else None
+    if meta is not None:
+        return meta
+    log_sampled("extract_meta", "Extracting metadata from file: %s", fp)
     meta = {"title": "", "artist": "", "album": "", "tracknumber": ""}
     try:
+        from mutagen import File
         audio = File(fp, easy=True)
         if audio and audio.tags:
-            log_debug(f"Found tags in file: {fp}")
+            log_sampled("extract_meta", "Found tags in file: %s", fp)
             for k in meta:
                 meta[k] = audio.tags.get(k, [""])[0]
-                log_debug(f"Extracted {k}: {meta[k]}")
+                log_sampled("extract_meta", "Extracted %s: %s", k, meta[k])
         else:
-            log_debug(f"No tags found in file: {fp}")
+            log_sampled("extract_meta", "No tags found in file: %s", fp)
     except Exception as e:
-        log_error(f"Error extracting meta {fp}: {e}")
+        log_error("Error extracting meta %s: %s", fp, e)
+        return meta
+    if st:
+        META_CACHE.put(key, st, meta)
     return meta
 
+@timed("import.file")
+def build_record(fp, s):
+    meta = extract_meta(fp, s)
+    return Record({
+        "artist": meta["artist"],
+        "title": meta["title"],
+        "album": meta["album"],
+        "tracknumber": meta["tracknumber"],
+        "file_size": s.st_size,
+        "file_name": os.path.basename(fp),
+        "full_path": os.path.abspath(fp),
+        "mtime": s.st_mtime_ns,
+        "inode": s.st_ino
+    })
+
+def is_unchanged(rec, s):
+    return (rec.get("mtime") == s.st_mtime_ns and rec.get("inode") == s.st_ino
+            and str(rec.get("file_size")) == str(s.st_size))
+
 def add_file(db, fp):
-    log_debug(f"Adding file: {fp}")
+    log_debug("Adding file: %s", fp)
     if not fp.lower().endswith(EXTS):
-        log_error(f"Unsupported file extension for: {fp}")
+        log_error("Unsupported file extension for: %s", fp)
         return db
     try:
         s = os.stat(fp)
-        log_debug(f"Obtained file stats for: {fp}")
+        log_debug("Obtained file stats for: %s", fp)
     except Exception as e:
-        log_error(f"Error accessing {fp}: {e}")
+        log_error("Error accessing %s: %s", fp, e)
         return db
-    meta = extract_meta(fp)
-    rec = {
-        "artist": meta["artist"],
-        "title": meta["title"],
-        "album": meta["album"],
-        "tracknumber": meta["tracknumber"],
-        "file_size": s.st_size,
-        "file_name": os.path.basename(fp),
-        "full_path": os.path.abspath(fp)
-    }
+    rec = build_record(fp, s)
     db[rec["full_path"]] = rec
-    log_debug(f"Added file record: {rec}")
+    log_debug("Added file record: %s", rec)
     return db
 
-def import_dir(db, d):
-    log_debug(f"Importing directory: {d}")
-    for r, _, fs in os.walk(d):
-        log_debug(f"Operating in directory: {r} with {len(fs)} file(s)")
-        for f in fs:
-            fp = os.path.join(r, f)
-            if fp.lower().endswith(EXTS):
-                log_debug(f"Found supported file: {fp}")
-                add_file(db, fp)
+def walk_audio(d, cancel=None, failed=None):
+    """Yield (path, stat) for supported files under d. Directories and files that could not be read are
+    appended to failed, when given, so callers do not mistake them for deleted."""
+    stack = [os.path.abspath(d)]
+    while stack:
+        if cancel and cancel.is_set():
+            log_debug("Directory walk cancelled")
+            return
+        r = stack.pop()
+        try:
+            with span("import.walk"), os.scandir(r) as it:
+                entries = list(it)
+        except OSError as e:
+            log_error("Error scanning %s: %s", r, e)
+            if failed is not None:
+                failed.append(r)
+            continue
+        log_debug("Operating in directory: %s with %s entries", r, len(entries))
+        for e in entries:
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.lower().endswith(EXTS):
+                    log_sampled("walk_audio", "Found supported file: %s", e.path)
+                    yield e.path, e.stat()
+                else:
+                    log_sampled("walk_audio", "Ignoring unsupported file: %s", e.path)
+            except OSError as ex:
+                log_error("Error accessing %s: %s", e.path, ex)
+                if failed is not None:
+                    failed.append(e.path)
+
+def new_summary():
+    return {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "missing": 0}
+
+def scan_dir(db, d, incremental=False, workers=IMPORT_WORKERS, cancel=None, progress=None):
+    log_debug("Scanning directory: %s (incremental=%s, workers=%s)", d, incremental, workers)
+    if progress is None:
+        progress = {"found": 0, "done": 0}
+    workers = max(1, workers)
+    root = os.path.abspath(d)
+    seen = set()
+    failed = []
+    batch = []
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for fp, s in walk_audio(root, cancel, failed):
+            seen.add(fp)
+            progress["found"] += 1
+            old = db.get(fp)
+            if incremental and old and is_unchanged(old, s):
+                batch.append(("unchanged", fp, None))
+                progress["done"] += 1
             else:
-                log_debug(f"Ignoring unsupported file: {fp}")
-    return db
+                pending.append(("updated" if old else "added", fp, pool.submit(build_record, fp, s)))
+            while pending and (pending[0][2].done() or len(pending) >= workers * 4):
+                status, pfp, fut = pending.popleft()
+                batch.append((status, pfp, fut.result()))
+                progress["done"] += 1
+            if len(batch) >= IMPORT_BATCH:
+                yield batch
+                batch = []
+        while pending and not (cancel and cancel.is_set()):
+            status, pfp, fut = pending.popleft()
+            batch.append((status, pfp, fut.result()))
+            progress["done"] += 1
+            if len(batch) >= IMPORT_BATCH:
+                yield batch
+                batch = []
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    if cancel and cancel.is_set():
+        log_debug("Scan of %s cancelled after %s file(s)", d, progress['done'])
+        if batch:
+            yield batch
+        return
+    prefix = root.rstrip(os.sep) + os.sep
+    unread = set(failed)
+    skip = tuple(f.rstrip(os.sep) + os.sep for f in failed)
+    if failed:
+        log_error("Not reporting missing files under %s unreadable path(s) in %s", len(failed), d)
+    batch.extend(("missing", k, None) for k in list(db)
+                 if k.startswith(prefix) and k not in seen and k not in unread and not k.startswith(skip))
+    if batch:
+        yield batch
+
+@timed("import.apply")
+def apply_scan(db, batch, summary, prune=False):
+    changed, removed = [], []
+    for status, fp, rec in batch:
+        if status == "missing":
+            if prune:
+                log_sampled("apply_scan", "Pruning vanished file: %s", fp)
+                db.pop(fp, None)
+                removed.append(fp)
+                summary["removed"] += 1
+            else:
+                log_sampled("apply_scan", "File missing on disk: %s", fp)
+                summary["missing"] += 1
+            continue
+        if rec is not None:
+            db[fp] = rec
+            changed.append(fp)
+        summary[status] += 1
+    return changed, removed
+
+@timed("import_dir")
+def import_dir(db, d, incremental=False, prune=False, workers=IMPORT_WORKERS, cancel=None, changed=None, removed=None):
+    log_debug("Importing directory: %s (incremental=%s, prune=%s)", d, incremental, prune)
+    summary = new_summary()
+    for batch in scan_dir(db, d, incremental, workers, cancel):
+        c, r = apply_scan(db, batch, summary, prune)
+        if changed is not None:
+            changed.extend(c)
+        if removed is not None:
+            removed.extend(r)
+    log_debug("Import summary for %s: %s", d, summary)
+    return summary
+
+def load_roots():
+    try:
+        with open(ROOTS_FILENAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        log_error("Error loading roots: %s", e)
+        return []
+
+def add_root(d):
+    roots = load_roots()
+    d = os.path.abspath(d)
+    if any(d == r or d.startswith(r.rstrip(os.sep) + os.sep) for r in roots):
+        return roots
+    roots = [r for r in roots if not r.startswith(d.rstrip(os.sep) + os.sep)] + [d]
+    log_debug("Recording imported root: %s", d)
+    try:
+        with open(ROOTS_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(roots, f, indent=4)
+    except Exception as e:
+        log_error("Error saving roots: %s", e)
+    return roots
+
+class LibraryWatcher:
+    """Polls the mtimes of every directory under the imported roots.
+
+    Directories whose mtime moved (files added, removed or renamed) are collected until they have been
+    quiet for WATCH_DEBOUNCE seconds, then rescanned and reported as scan_dir-style changes.
+    In-place edits of existing files do not touch the directory mtime and are left to Rescan.
+    Only a directory that no longer exists counts as removed; other errors (a flaky NFS/NAS mount)
+    keep it watched and retry it. Nothing is reported while a root is unreachable: unreadable, empty,
+    or on another device than when first seen (an unmounted share leaves its empty mount point).
+    """
+    def __init__(self, roots):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.devices = {}
+        self.dirs = {}
+        self.pending = set()
+        self.last_change = 0.0
+
+    def discover(self, d):
+        found = []
+        stack = [d]
+        while stack:
+            r = stack.pop()
+            try:
+                st = os.stat(r)
+                with os.scandir(r) as it:
+                    entries = list(it)
+                stack.extend(e.path for e in entries if e.is_dir(follow_symlinks=False) and e.path not in self.dirs)
+            except OSError as e:
+                log_error("Error watching %s: %s", r, e)
+                continue
+            if r in self.roots and entries:
+                self.devices.setdefault(r, st.st_dev)
+            self.dirs[r] = st.st_mtime_ns
+            found.append(r)
+        return found
+
+    def poll(self):
+        changed = []
+        for d, mtime in list(self.dirs.items()):
+            try:
+                now = os.stat(d).st_mtime_ns
+            except (FileNotFoundError, NotADirectoryError):
+                del self.dirs[d]
+                changed.append(d)
+                continue
+            except OSError as e:
+                log_error("Error watching %s, will retry: %s", d, e)
+                self.dirs[d] = None
+                continue
+            if now != mtime:
+                self.dirs[d] = now
+                changed.append(d)
+        for d in list(changed):
+            if d not in self.dirs:
+                continue
+            try:
+                with os.scandir(d) as it:
+                    new = [e.path for e in it if e.is_dir(follow_symlinks=False) and e.path not in self.dirs]
+            except OSError:
+                continue
+            for n in new:
+                changed.extend(self.discover(n))
+        for r in self.roots:
+            if r not in self.dirs and os.path.isdir(r):
+                changed.extend(self.discover(r))
+        return changed
+
+    def check(self, db):
+        now = time.monotonic()
+        dirs = self.poll()
+        if dirs:
+            log_debug("Watcher saw %s changed director(ies)", len(dirs))
+            self.pending.update(dirs)
+            self.last_change = now
+            return []
+        if not self.pending or now - self.last_change < WATCH_DEBOUNCE:
+            return []
+        pending, self.pending = self.pending, set()
+        return self.changes(db, pending)
 
-def create_form(frame, fields, init=None):
-    log_debug("Creating form.")
-    entries = {}
-    for idx, (label, key) in enumerate(fields):
-        ttk.Label(frame, text=label).grid(row=idx, column=0, sticky="w", pady=2)
-        ent = ttk.Entry(frame, width=50)
-        ent.grid(row=idx, column=1, sticky="w", pady=2)
-        entries[key] = ent
-        if key == "full_path":
-            ttk.Button(frame, text="Browse", command=lambda e=ent: browse_file(e, entries)).grid(row=idx, column=2, padx=5)
-        if init and key in init:
-            log_debug(f"Initializing field '{key}' with value '{init[key]}'")
-            ent.insert(0, str(init[key]))
-    log_debug("Form created.")
-    return entries
-
-def browse_file(path_entry, entries):
-    log_debug("Browsing file...")
-    fp = filedialog.askopenfilename(title="Select", filetypes=[("Audio", "*.mp3 *.ogg *.oga *.flac")])
-    if fp:
-        log_debug(f"File selected: {fp}")
-        path_entry.delete(0, tk.END)
-        path_entry.insert(0, fp)
-        entries["file_name"].delete(0, tk.END)
-        entries["file_name"].insert(0, os.path.basename(fp))
+    def root_ok(self, r):
         try:
-            size = os.stat(fp).st_size
-            entries["file_size"].delete(0, tk.END)
-            entries["file_size"].insert(0, size)
-            log_debug(f"File size for '{fp}' is {size} bytes")
-        except Exception as e:
-            log_error(f"Error for {fp}: {e}")
-
-class BaseDialog(tk.Toplevel):
-    def __init__(self, master, title, fields, init=None):
-        log_debug(f"Initializing BaseDialog titled '{title}'")
-        super().__init__(master)
-        self.title(title)
-        self.resizable(False, False)
-        self.transient(master)
-        self.grab_set()
-        self.result = None
-        frame = ttk.Frame(self)
-        frame.pack(padx=10, pady=10, fill="both", expand=True)
-        self.entries = create_form(frame, fields, init)
-        self.btn_frame = ttk.Frame(self)
-        self.btn_frame.pack(pady=10)
-        ttk.Button(self.btn_frame, text="OK", command=self.on_ok).pack(side="left", padx=5)
-        ttk.Button(self.btn_frame, text="Cancel", command=self.destroy).pack(side="left", padx=5)
-        log_debug("BaseDialog initialized.")
-
-    def on_ok(self):
-        log_debug("OK clicked on BaseDialog; processing entries.")
-        self.result = {k: e.get().strip() for k, e in self.entries.items()}
-        if self.result.get("full_path", "").lower().endswith(EXTS):
-            meta = extract_meta(self.result["full_path"])
-            for f in ("artist", "title", "album", "tracknumber"):
-                if not self.result[f]:
-                    self.result[f] = meta[f]
-                    log_debug(f"Updated field '{f}' with metadata: {meta[f]}")
-            if not self.result["file_name"]:
-                self.result["file_name"] = os.path.basename(self.result["full_path"])
-                log_debug(f"Set file_name to {self.result['file_name']}")
-            if not self.result["file_size"]:
-                try:
-                    self.result["file_size"] = os.stat(self.result["full_path"]).st_size
-                    log_debug(f"Set file_size to {self.result['file_size']}")
-                except Exception as e:
-                    log_error(f"Error getting file size for {self.result['full_path']}: {e}")
-                    self.result["file_size"] = ""
-        log_debug(f"Dialog result: {self.result}")
-        self.destroy()
-
-class EntryDialog(BaseDialog):
-    def __init__(self, master, title, init=None):
-        log_debug(f"Initializing EntryDialog titled '{title}'")
-        fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber"),
-                  ("Size", "file_size"), ("Name", "file_name"), ("Path", "full_path")]
-        super().__init__(master, title, fields, init)
-
-class ExtendedEntryDialog(tk.Toplevel):
-    def __init__(self, master, keys_list, current_index, db):
-        log_debug("Initializing ExtendedEntryDialog")
-        super().__init__(master)
-        self.master = master
-        self.keys_list = keys_list
-        self.current_index = current_index
-        self.db = db
-        self.title("Edit Extended")
-        self.resizable(False, False)
-        self.transient(master)
-        self.grab_set()
-        self.result = None
-        self.fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber"),
-                       ("Size", "file_size"), ("Name", "file_name"), ("Path", "full_path")]
-        self.form_frame = ttk.Frame(self)
-        self.form_frame.pack(padx=10, pady=10, fill="both", expand=True)
-        self.entries = create_form(self.form_frame, self.fields, self.current_record())
-        self.nav_frame = ttk.Frame(self)
-        self.nav_frame.pack(pady=10)
-        ttk.Button(self.nav_frame, text="Previous", command=self.go_previous).pack(side="left", padx=5)
-        ttk.Button(self.nav_frame, text="Save", command=self.save_current).pack(side="left", padx=5)
-        ttk.Button(self.nav_frame, text="Next", command=self.go_next).pack(side="left", padx=5)
-        ttk.Button(self.nav_frame, text="Close", command=self.on_close).pack(side="left", padx=5)
-        log_debug("ExtendedEntryDialog initialized.")
-
-    def current_record(self):
-        key = self.keys_list[self.current_index]
-        log_debug(f"Fetching current record for key: {key}")
-        return self.db.get(key, {})
-
-    def update_form(self):
-        rec = self.current_record()
-        log_debug(f"Updating form with record: {rec}")
-        for key, entry in self.entries.items():
-            entry.delete(0, tk.END)
-            entry.insert(0, str(rec.get(key, "")))
-
-    def save_current(self):
-        log_debug("Saving current record in ExtendedEntryDialog.")
-        rec = {k: e.get().strip() for k, e in self.entries.items()}
-        if rec.get("full_path", "").lower().endswith(EXTS):
-            meta = extract_meta(rec["full_path"])
-            for f in ("artist", "title", "album", "tracknumber"):
-                if not rec[f]:
-                    rec[f] = meta[f]
-                    log_debug(f"Auto-filled field '{f}' with meta: {meta[f]}")
-            if not rec["file_name"]:
-                rec["file_name"] = os.path.basename(rec["full_path"])
-                log_debug(f"Set file_name: {rec['file_name']}")
-            if not rec["file_size"]:
+            st = os.stat(r)
+            with os.scandir(r) as it:
+                empty = next(it, None) is None
+        except OSError:
+            return False
+        if empty:
+            return False
+        return self.devices.setdefault(r, st.st_dev) == st.st_dev
+
+    def reachable(self, d, ok):
+        for r in self.roots:
+            if d == r or d.startswith(r.rstrip(os.sep) + os.sep):
+                if r not in ok:
+                    ok[r] = self.root_ok(r)
+                if not ok[r]:
+                    return False
+        return True
+
+    def changes(self, db, dirs):
+        dirs = set(dirs)
+        ok = {}
+        for d in list(dirs):
+            if not self.reachable(d, ok):
+                log_error("Root of %s is unreachable, will retry", d)
+                dirs.discard(d)
+                self.pending.add(d)
+        known = {}
+        for k in list(db):
+            d = os.path.dirname(k)
+            if d in dirs:
+                known.setdefault(d, set()).add(k)
+        out = []
+        for d in dirs:
+            seen = set()
+            try:
+                with os.scandir(d) as it:
+                    entries = [e for e in it if e.name.lower().endswith(EXTS) and e.is_file()]
+            except (FileNotFoundError, NotADirectoryError):
+                entries = []
+            except OSError as e:
+                log_error("Error rescanning %s, will retry: %s", d, e)
+                self.pending.add(d)
+                continue
+            for e in entries:
                 try:
-                    rec["file_size"] = os.stat(rec["full_path"]).st_size
-                    log_debug(f"Set file_size: {rec['file_size']}")
-                except Exception as e:
-                    log_error(f"Error getting file size {rec['full_path']}: {e}")
-                    rec["file_size"] = ""
-        current_key = self.keys_list[self.current_index]
-        new_key = rec.get("full_path")
-        if new_key and new_key != current_key:
-            self.db.pop(current_key, None)
-            self.db[new_key] = rec
-            self.keys_list[self.current_index] = new_key
-            log_debug(f"Updated record key: replaced {current_key} with {new_key}")
-        else:
-            self.db[current_key] = rec
-            log_debug(f"Saved record for key: {current_key}")
-        messagebox.showinfo("Save", "Saved.")
-
-    def go_previous(self):
-        log_debug("Navigating to previous record.")
-        if self.current_index == 0:
-            messagebox.showinfo("Navigation", "1st record.")
-            log_debug("Already at first record; cannot go previous.")
-            return
-        self.save_current()
-        self.current_index -= 1
-        self.update_form()
-        log_debug(f"Moved to record index: {self.current_index}")
-
-    def go_next(self):
-        log_debug("Navigating to next record.")
-        if self.current_index == len(self.keys_list) - 1:
-            messagebox.showinfo("Navigation", "Last record.")
-            log_debug("Already at last record; cannot go next.")
-            return
-        self.save_current()
-        self.current_index += 1
-        self.update_form()
-        log_debug(f"Moved to record index: {self.current_index}")
-
-    def on_close(self):
-        log_debug("Closing ExtendedEntryDialog; saving current record.")
-        self.save_current()
-        self.destroy()
-
-class MultiEditDialog(BaseDialog):
-    def __init__(self, master):
-        log_debug("Initializing MultiEditDialog")
-        fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber")]
-        super().__init__(master, "Multi-Edit", fields)
-
-    def on_ok(self):
-        log_debug("OK clicked on MultiEditDialog; processing entries.")
-        self.result = {k: e.get().strip() for k, e in self.entries.items() if e.get().strip()}
-        log_debug(f"MultiEditDialog result: {self.result}")
-        self.destroy()
-
-class MusicDBApp(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        try:
-            icon = tk.PhotoImage(file="/home/coder/bin/Python/Music_Manager/music_manager_icon.png")
-            self.iconphoto(False, icon)
-        except Exception as e:
-            log_error(f"Failed to load icon: {e}")
-        log_debug("Initializing MusicDBApp")
-        self.title("Music Manager")
-        self.geometry("1000x600")
-        self.db = load_db()
-        log_debug(f"Database loaded with {len(self.db)} records")
-        self.sort_info = {"column": None, "reverse": False}
-        self.search_text = tk.StringVar()
-        self.create_widgets()
-        self.protocol("WM_DELETE_WINDOW", self.on_close)
-
-    def create_widgets(self):
-        log_debug("Creating widgets")
-        s = ttk.Style(self)
-        s.theme_use("clam")
-        s.configure("Treeview", background="black", foreground="white", fieldbackground="black", font=("TkDefaultFont", 11))
-        s.configure("Treeview.Heading", background="grey20", foreground="white")
-        
-        toolbar = ttk.Frame(self)
-        toolbar.pack(fill="x", padx=5, pady=5)
-        for (txt, cmd) in [("Import Directory", self.handle_import_directory),
-                           ("Add File", self.handle_add_file),
-                           ("Add Manually", self.handle_add_entry),
-                           ("Edit", self.handle_edit_entry),
-                           ("Delete", self.handle_delete_entry),
-                           ("PlayMe", self.handle_open_playme),
-                           ("Refresh", self.refresh_list),
-                           ("Save to File", self.handle_save_to_file),
-                           ("Close", self.on_close)]:
-            log_debug(f"Adding toolbar button: {txt}")
-            ttk.Button(toolbar, text=txt, command=cmd).pack(side="left", padx=2)
-
-        s_frame = ttk.Frame(self)
-        s_frame.pack(fill="x", padx=5, pady=(0,5))
-        ttk.Label(s_frame, text="Search:").pack(side="left")
-        se = ttk.Entry(s_frame, textvariable=self.search_text, width=40)
-        se.pack(side="left", padx=2)
-        se.bind("<Return>", lambda e: self.search_records())
-        for txt, cmd in [("Search", self.search_records), ("Clear Search", self.clear_search)]:
-            log_debug(f"Adding search toolbar button: {txt}")
-            ttk.Button(s_frame, text=txt, command=cmd).pack(side="left", padx=2)
-        
-        cont = ttk.Frame(self)
-        cont.pack(fill="both", expand=True, padx=5, pady=5)
-        scrollbar = ttk.Scrollbar(cont, orient="vertical")
-        scrollbar.pack(side="right", fill="y")
-        cols = ("artist", "title", "album", "tracknumber", "file_size", "file_name", "full_path")
-        self.tree = ttk.Treeview(cont, columns=cols, show="headings", selectmode="extended", yscrollcommand=scrollbar.set)
-        for col in cols:
-            self.tree.heading(col, text=col.replace("_", " ").title(), command=lambda c=col: self.sort_by_column(c))
-            self.tree.column(col, width=100, anchor="w")
-            log_debug(f"Configured tree column: {col}")
-        self.tree.tag_configure("odd", background="black")
-        self.tree.tag_configure("even", background="grey20")
-        self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.config(command=self.tree.yview)
-        self.total_label = ttk.Label(self, text="Total Files: 0")
-        self.total_label.pack(side="bottom", pady=5)
-        log_debug("Widgets created, refreshing list")
-        self.refresh_list()
-
-    def refresh_list(self, recs=None):
-        log_debug("Refreshing list")
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        recs = recs or list(self.db.values())
-        if self.sort_info["column"]:
-            log_debug(f"Sorting list by column: {self.sort_info['column']} with reverse={self.sort_info['reverse']}")
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                except OSError as ex:
+                    log_error("Error accessing %s: %s", e.path, ex)
+                    seen.add(e.path)
+                    continue
+                seen.add(e.path)
+                old = db.get(e.path)
+                if old and is_unchanged(old, st):
+                    continue
+                out.append(("updated" if old else "added", e.path, build_record(e.path, st)))
+            out.extend(("missing", k, None) for k in known.get(d, set()) - seen)
+        log_debug("Watcher found %s change(s) in %s director(ies)", len(out), len(dirs))
+        return out
+
+    def run(self, db, cancel, emit):
+        for r in self.roots:
+            self.discover(r)
+        log_debug("Watching %s director(ies) under %s root(s)", len(self.dirs), len(self.roots))
+        while not cancel.wait(WATCH_INTERVAL):
             try:
-                recs.sort(key=lambda r: int(r.get("file_size") or 0) if self.sort_info["column"] == "file_size"
-                          else r.get(self.sort_info["column"], "").lower(), reverse=self.sort_info["reverse"])
+                changes = self.check(db)
             except Exception as e:
-                log_error(f"Sort error: {e}")
+                log_error("Watcher poll failed: %s", e)
+                continue
+            if changes:
+                emit(changes)
+
+def write_tags(rec):
+    fp = rec.get("full_path")
+    try:
+        st = os.stat(fp) if fp else None
+    except OSError:
+        st = None
+    if st is None or not S_ISREG(st.st_mode):
+        log_error("File not found: %s", fp)
+        return "failed"
+    wanted = {t: str(rec[t]) for t in TAG_FIELDS if rec.get(t)}
+    cached = META_CACHE.get(fp, st)
+    if cached is not None and all(cached[t] == v for t, v in wanted.items()):
+        log_sampled("write_tags", "Tags already up to date (cached): %s", fp)
+        return "unchanged"
+    try:
+        from mutagen import File
+        audio = File(fp, easy=True)
+        if audio is None:
+            log_error("Mutagen could not open file: %s", fp)
+            return "failed"
+        if audio.tags is None:
+            audio.add_tags()
+        if all(audio.tags.get(t, [""])[0] == v for t, v in wanted.items()):
+            log_sampled("write_tags", "Tags already up to date: %s", fp)
+            return "unchanged"
+        for t, v in wanted.items():
+            audio[t] = v
+        META_CACHE.invalidate(fp)
+        audio.save()
+        log_sampled("write_tags", "Wrote tags %s to file: %s", wanted, fp)
+        return "written"
+    except Exception as e:
+        log_error("Error writing metadata to %s: %s", fp, e)
+        return "failed"
+
+def run_pool(fn, items, workers, cancel=None):
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = deque()
+        it = iter(items)
+        while True:
+            while len(futures) < workers * 4 and not (cancel and cancel.is_set()):
+                item = next(it, None)
+                if item is None:
+                    break
+                futures.append((item, pool.submit(fn, item)))
+            if not futures:
+                break
+            item, fut = futures.popleft()
+            yield item, fut.result()
+
+def write_back(recs, workers=WRITE_WORKERS, cancel=None, progress=None):
+    if progress is None:
+        progress = {"found": 0, "done": 0}
+    progress["found"] = len(recs)
+    batch = []
+    for rec, status in run_pool(write_tags, recs, workers, cancel):
+        fp = rec["full_path"]
+        try:
+            st = os.stat(fp) if status != "failed" else None
+        except OSError:
+            st = None
+        batch.append((fp, status, st))
+        progress["done"] += 1
+        if len(batch) >= IMPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def payload_span(f, size):
+    """Byte range of the audio payload, skipping ID3v2/FLAC metadata in front and ID3v1/APEv2 tags at the end.
+
+    Ogg files carry their tags inside the stream, so they are hashed whole.
+    """
+    head = f.read(10)
+    start, end = 0, size
+    if head[:3] == b"ID3" and len(head) == 10:
+        start = 10 + ((head[6] & 0x7f) << 21 | (head[7] & 0x7f) << 14 | (head[8] & 0x7f) << 7 | (head[9] & 0x7f))
+        if head[5] & 0x10:
+            start += 10
+    elif head[:4] == b"fLaC":
+        start = 4
+        while True:
+            f.seek(start)
+            block = f.read(4)
+            if len(block) < 4:
+                break
+            start += 4 + int.from_bytes(block[1:4], "big")
+            if block[0] & 0x80:
+                break
+    if size - start >= 128:
+        f.seek(size - 128)
+        if f.read(3) == b"TAG":
+            end -= 128
+    if end - start >= 32:
+        f.seek(end - 32)
+        foot = f.read(32)
+        if foot[:8] == b"APETAGEX":
+            end -= int.from_bytes(foot[12:16], "little")
+            if int.from_bytes(foot[20:24], "little") & 0x80000000:
+                end -= 32
+    return min(start, size), max(min(start, size), end)
+
+def content_hash(fp, size, full=False):
+    h = hashlib.blake2b(digest_size=16)
+    with open(fp, 'rb') as f:
+        start, end = payload_span(f, size)
+        if not full and end - start > 2 * HASH_CHUNK:
+            f.seek(start)
+            h.update(f.read(HASH_CHUNK))
+            f.seek(end - HASH_CHUNK)
+            h.update(f.read(HASH_CHUNK))
         else:
-            recs.sort(key=lambda r: r.get("artist", "").lower())
-        for idx, r in enumerate(recs):
-            tag = "even" if idx % 2 == 0 else "odd"
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(1024 * 1024, remaining))
+                if not chunk:
+                    break
+                h.update(chunk)
+                remaining -= len(chunk)
+    return h.hexdigest()
+
+def find_duplicates(items, workers=HASH_WORKERS, cancel=None, progress=None):
+    """Find files with identical audio payloads.
+
+    items maps full_path to (file_size, cached hashes). Records are bucketed by their catalog size, only
+    buckets with more than one file are hashed (head/tail chunks first, then the whole payload), and cached
+    hashes are reused while the file's size and mtime still match. Yields ("hashes", [(key, hashes), ...])
+    cache updates and finally ("groups", [[key, ...], ...]).
+    """
+    if progress is None:
+        progress = {"found": 0, "done": 0}
+    buckets = {}
+    for k, (size, _) in items.items():
+        try:
+            size = int(size or 0)
+        except (TypeError, ValueError):
+            continue
+        if size > 0:
+            buckets.setdefault(size, []).append(k)
+    keys = [k for ks in buckets.values() if len(ks) > 1 for k in ks]
+    log_debug("Duplicate scan: %s candidate(s) in %s size bucket(s)", len(keys),
+              sum(1 for ks in buckets.values() if len(ks) > 1))
+    hashes = {}
+    for kind in ("partial", "full"):
+        progress["found"] += len(keys)
+
+        def compute(k):
             try:
-                size_bytes = int(r.get("file_size") or 0)
-                size_mb = f"{size_bytes/(1024*1024):.2f} MB"
-            except Exception:
-                size_mb = ""
-            self.tree.insert("", tk.END, iid=r["full_path"],
-                             values=(r["artist"], r["title"], r["album"], r["tracknumber"], size_mb, r["file_name"], r["full_path"]),
-                             tags=(tag,))
-            log_debug(f"Inserted record: {r['full_path']} with tag: {tag}")
-        self.total_label.config(text=f"Total Files: {len(self.db)}")
-        log_debug(f"Total files displayed: {len(self.db)}")
-
-    def sort_by_column(self, col):
-        log_debug(f"Sorting by column: {col}")
-        if self.sort_info["column"] == col:
-            self.sort_info["reverse"] = not self.sort_info["reverse"]
-            log_debug(f"Toggled sort order for '{col}'. Reverse now: {self.sort_info['reverse']}")
-        else:
-            self.sort_info = {"column": col, "reverse": False}
-            log_debug(f"Switched sort column to: {col}")
-        self.refresh_list()
-
-    def search_records(self):
-        term = self.search_text.get().strip().lower()
-        log_debug(f"Searching records for term: '{term}'")
-        if not term:
-            log_debug("Empty search term; displaying all records")
-            self.refresh_list()
+                st = os.stat(k)
+                cached = items[k][1] or {}
+                if cached.get("size") != st.st_size or cached.get("mtime") != st.st_mtime_ns:
+                    cached = {"size": st.st_size, "mtime": st.st_mtime_ns}
+                if kind in cached:
+                    return cached, False
+                h = dict(cached)
+                h[kind] = content_hash(k, st.st_size, kind == "full")
+                return h, True
+            except OSError as e:
+                log_error("Error hashing %s: %s", k, e)
+                return None, False
+
+        updates = []
+        for k, (h, fresh) in run_pool(compute, keys, workers, cancel):
+            progress["done"] += 1
+            if h is None:
+                continue
+            hashes[k] = h
+            items[k] = (h["size"], h)
+            if fresh:
+                updates.append((k, h))
+            if len(updates) >= IMPORT_BATCH:
+                yield "hashes", updates
+                updates = []
+        if updates:
+            yield "hashes", updates
+        if cancel and cancel.is_set():
+            log_debug("Duplicate scan cancelled")
             return
-        filtered = [r for r in self.db.values() if any(term in str(r.get(k, "")).lower() for k in r)]
-        log_debug(f"Found {len(filtered)} records matching '{term}'")
-        self.refresh_list(filtered)
-
-    def clear_search(self):
-        log_debug("Clearing search criteria")
-        self.search_text.set("")
-        self.refresh_list()
-
-    def handle_import_directory(self):
-        log_debug("Triggered handle_import_directory")
-        d = filedialog.askdirectory(title="Select Directory")
-        if d:
-            log_debug(f"Directory selected for import: {d}")
-            self.db = import_dir(self.db, d)
-            log_debug(f"Database updated after import; now {len(self.db)} records")
-            save_db(self.db)
-            self.refresh_list()
-            messagebox.showinfo("Import", "Completed")
-        else:
-            log_debug("No directory selected for import")
-
-    def handle_add_file(self):
-        log_debug("Triggered handle_add_file")
-        fp = filedialog.askopenfilename(title="Select", filetypes=[("Audio", "*.mp3 *.ogg *.oga *.flac")])
-        if fp:
-            log_debug(f"File selected for addition: {fp}")
-            add_file(self.db, fp)
-            save_db(self.db)
-            self.refresh_list()
-            messagebox.showinfo("Add", f"File '{os.path.basename(fp)}' added")
+        groups = {}
+        for k in keys:
+            if k in hashes:
+                groups.setdefault((hashes[k]["size"], hashes[k][kind]), []).append(k)
+        keys = [k for ks in groups.values() if len(ks) > 1 for k in ks]
+        log_debug("Duplicate scan: %s file(s) still matching after %s hash", len(keys), kind)
+    yield "groups", sorted(sorted(ks) for ks in groups.values() if len(ks) > 1)
+
+def apply_write(db, batch, snapshot, counts):
+    changed = []
+    for key, status, st in batch:
+        counts[status] = counts.get(status, 0) + 1
+        rec = db.get(key)
+        if rec is None or st is None:
+            continue
+        rec.update(file_size=st.st_size, mtime=st.st_mtime_ns, inode=st.st_ino)
+        if all(rec.get(t) == snapshot[key].get(t) for t in TAG_FIELDS):
+            rec.pop("dirty", None)
+        changed.append(key)
+    return changed
+
+def format_summary(summary):
+    lines = [f"{k.title()}: {summary[k]}" for k in ("added", "updated", "unchanged", "removed")]
+    if summary.get("missing"):
+        lines.append(f"Missing: {summary['missing']}")
+    return "\n".join(lines)
+
+def verify_dir(item):
+    """Check one directory's records with a single scandir: (status, key) for every missing or changed one."""
+    d, keys = item
+    try:
+        with os.scandir(d) as it:
+            entries = {e.name: e for e in it}
+    except FileNotFoundError:
+        return [("missing", k) for k, _ in keys]
+    except OSError as e:
+        log_error("Error scanning %s: %s", d, e)
+        return []
+    found = []
+    for k, rec in keys:
+        e = entries.get(os.path.basename(k))
+        try:
+            st = e.stat() if e is not None and not e.is_dir() else None
+        except FileNotFoundError:
+            st = None
+        except OSError as ex:
+            log_error("Error accessing %s: %s", k, ex)
+            continue
+        if st is None:
+            found.append(("missing", k))
+        elif (str(rec.get("file_size")) != str(st.st_size)
+              or rec.get("mtime") is not None and rec.get("mtime") != st.st_mtime_ns):
+            found.append(("changed", k))
+    return found
+
+def verify_library(db, workers=VERIFY_WORKERS, cancel=None, progress=None):
+    """Yield batches of (status, key) for records whose file is gone ("missing") or differs in size or mtime
+    ("changed"). Records are grouped by directory and each directory is listed once on a thread pool."""
+    if progress is None:
+        progress = {"found": 0, "done": 0}
+    dirs = {}
+    for k, rec in db.items():
+        dirs.setdefault(os.path.dirname(k), []).append((k, rec))
+    progress["found"] = len(db)
+    log_debug("Verifying %s record(s) in %s directories with %s worker(s)", len(db), len(dirs), workers)
+    batch = []
+    for (d, keys), found in run_pool(verify_dir, list(dirs.items()), workers, cancel):
+        progress["done"] += len(keys)
+        batch.extend(found)
+        if len(batch) >= IMPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def reimport(keys, workers=IMPORT_WORKERS, cancel=None, progress=None):
+    """Rebuild records for keys from their files, as apply_scan batches ("updated"/"missing")."""
+    if progress is None:
+        progress = {"found": 0, "done": 0}
+    progress["found"] = len(keys)
+
+    def rebuild(fp):
+        try:
+            return build_record(fp, os.stat(fp))
+        except OSError:
+            return None
+
+    batch = []
+    for fp, rec in run_pool(rebuild, list(keys), workers, cancel):
+        batch.append(("updated", fp, rec) if rec is not None else ("missing", fp, None))
+        progress["done"] += 1
+        if len(batch) >= IMPORT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def db_signature():
+    try:
+        st = os.stat(db_path())
+    except OSError:
+        return None
+    try:
+        jst = os.stat(journal_path())
+        journal = (jst.st_size, jst.st_mtime_ns)
+    except OSError:
+        journal = None
+    return (DB_BACKEND, st.st_size, st.st_mtime_ns, journal)
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+QUERY_TOKEN = re.compile(r'(-?)(?:([a-z_]+)(:|>=|<=|>|<|=))?("[^"]*"?|\S+)', re.I)
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3}
+QUERY_OPS = {"=": lambda a, b: a == b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+             "<": lambda a, b: a < b, "<=": lambda a, b: a <= b}
+
+def numeric_value(rec, field):
+    if field == "file_size":
+        try:
+            return int(rec.get("file_size"))
+        except (TypeError, ValueError):
+            return None
+    m = re.match(r"\s*(\d+)", str(rec.get(field, "")))
+    return int(m.group(1)) if m else None
+
+def parse_number(field, text):
+    if field == "file_size":
+        m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmg]?b?)", text)
+        return int(float(m.group(1)) * SIZE_UNITS[m.group(2)]) if m else None
+    return int(text) if text.isdigit() else None
+
+def parse_query(text):
+    """Parse a search box string into (negate, field, op, value) clauses, or None for a plain substring search
+    (also when nothing parsed yet, e.g. a half-typed title:", so it never matches the whole catalog).
+
+    Clauses are ANDed. field:value matches a substring of one field (artist, title, album, name, path),
+    size and track compare numbers with :, =, <, <=, > or >= (sizes may end in KB, MB or GB), "quotes"
+    keep spaces in a value and a leading - negates. Bare words match any field as a plain search does.
+    """
+    clauses = []
+    structured = False
+    for m in QUERY_TOKEN.finditer(text.lower()):
+        neg, name, op, value = m.groups()
+        field = QUERY_FIELDS.get(name)
+        quoted = value.startswith('"')
+        value = value.strip('"')
+        if field in NUMERIC_FIELDS:
+            number = parse_number(field, value)
+            if number is None:
+                field = None
+            else:
+                op, value = ("=" if op == ":" else op), number
+        elif field and op != ":":
+            field = None
+        if name and field is None:
+            op, value = None, m.group(0)[len(neg):].replace('"', "")
+        structured = structured or bool(neg or field or quoted)
+        if value != "":
+            clauses.append((bool(neg), field, op, value))
+    return clauses if structured and clauses else None
+
+class SearchIndex:
+    """Token and trigram index over SEARCH_FIELDS plus each record's directory.
+
+    Directories are indexed once and shared by all records inside them, so long
+    path prefixes are not repeated per track.
+    """
+    def __init__(self):
+        self.text = {}
+        self.grams = {}
+        self.tokens = {}
+        self.dirs = {}
+        self.dir_grams = {}
+        self.numbers = {f: [] for f in NUMERIC_FIELDS}
+        self.values = {}
+
+    def build(self, db):
+        log_debug("Building search index for %s record(s)", len(db))
+        for key, rec in db.items():
+            self.add(key, rec, defer=True)
+        for order in self.numbers.values():
+            order.sort()
+        log_debug("Search index built: %s trigrams, %s tokens, %s dirs",
+                  len(self.grams), len(self.tokens), len(self.dirs))
+
+    def add(self, key, rec, defer=False):
+        if key in self.text:
+            self.remove(key)
+        values = tuple(numeric_value(rec, f) for f in NUMERIC_FIELDS)
+        self.values[key] = values
+        for f, v in zip(NUMERIC_FIELDS, values):
+            if v is not None:
+                if defer:
+                    self.numbers[f].append((v, key))
+                else:
+                    insort(self.numbers[f], (v, key))
+        fields = [str(rec.get(f, "")).lower() for f in SEARCH_FIELDS]
+        fields.append(os.path.basename(key).lower())
+        text = "\0".join(fields)
+        self.text[key] = text
+        for g in trigrams(text):
+            if "\0" not in g:
+                self.grams.setdefault(g, set()).add(key)
+        for t in set(re.findall(r"\w+", text)):
+            self.tokens.setdefault(t, set()).add(key)
+        d = os.path.dirname(key).lower() + os.sep
+        if d not in self.dirs:
+            self.dirs[d] = set()
+            for g in trigrams(d):
+                self.dir_grams.setdefault(g, set()).add(d)
+        self.dirs[d].add(key)
+
+    def remove(self, key):
+        text = self.text.pop(key, None)
+        if text is None:
+            return
+        for f, v in zip(NUMERIC_FIELDS, self.values.pop(key, ())):
+            order = self.numbers[f]
+            i = bisect_left(order, (v, key)) if v is not None else len(order)
+            if i < len(order) and order[i] == (v, key):
+                del order[i]
+        for g in trigrams(text):
+            discard_posting(self.grams, g, key)
+        for t in set(re.findall(r"\w+", text)):
+            discard_posting(self.tokens, t, key)
+        d = os.path.dirname(key).lower() + os.sep
+        discard_posting(self.dirs, d, key)
+        if d not in self.dirs:
+            for g in trigrams(d):
+                discard_posting(self.dir_grams, g, d)
+
+    def update(self, db, changed=(), removed=()):
+        for key in removed:
+            self.remove(key)
+        for key in changed:
+            if key in db:
+                self.add(key, db[key])
+            else:
+                self.remove(key)
+
+    def lookup(self, index, term):
+        posts = [index.get(g) for g in trigrams(term)]
+        if not all(posts):
+            return set()
+        posts.sort(key=len)
+        return posts[0].intersection(*posts[1:])
+
+    def match_dirs(self, term):
+        if len(term) >= 3:
+            cands = self.lookup(self.dir_grams, term)
         else:
-            log_debug("No file selected in handle_add_file")
-
-    def handle_add_entry(self):
-        log_debug("Triggered handle_add_entry")
-        d = EntryDialog(self, "Add New")
-        self.wait_window(d)
-        if d.result and d.result.get("full_path"):
-            log_debug(f"New entry added with full_path: {d.result['full_path']}")
-            self.db[d.result["full_path"]] = d.result
-            save_db(self.db)
-            self.refresh_list()
-            messagebox.showinfo("Add", "Added")
+            cands = self.dirs
+        return [d for d in cands if term in d]
+
+    def in_dir(self, key, term):
+        d = os.path.dirname(key).lower() + os.sep
+        if os.sep in term:
+            return term.rsplit(os.sep, 1)[0] in d and term in key.lower()
+        return term in d
+
+    def field_text(self, key, field):
+        if field == "full_path":
+            return key.lower()
+        return self.text[key].split("\0")[SEARCH_FIELDS.index(field)]
+
+    def number_range(self, field, op, value):
+        order = self.numbers[field]
+        lo = bisect_left(order, value, key=lambda e: e[0])
+        hi = bisect_right(order, value, key=lambda e: e[0])
+        return order, *{"=": (lo, hi), ">": (hi, len(order)), ">=": (lo, len(order)),
+                         "<": (0, lo), "<=": (0, hi)}[op]
+
+    def estimate(self, clause):
+        """Upper bound on a clause's hits, from posting sizes, used to run the most selective clause first."""
+        neg, field, op, value = clause
+        if field in NUMERIC_FIELDS:
+            order, lo, hi = self.number_range(field, op, value)
+            return hi - lo
+        if len(value) < 3:
+            return len(self.text)
+        posts = [len(self.grams.get(g, ())) for g in trigrams(value)]
+        if field in SEARCH_FIELDS:
+            return min(posts)
+        return min([n for n in posts if n] or [len(self.text)])
+
+    def candidates(self, clause):
+        neg, field, op, value = clause
+        if field in NUMERIC_FIELDS:
+            order, lo, hi = self.number_range(field, op, value)
+            return {k for _, k in order[lo:hi]}
+        if field is None:
+            return self.search(value)
+        if field == "full_path":
+            return {k for k in self.search(value) if value in k.lower()}
+        if len(value) >= 3:
+            cands = self.lookup(self.grams, value)
         else:
-            log_debug("Add entry failed: 'full_path' missing or dialog cancelled")
-            messagebox.showerror("Error", "Full Path")
-
-    def handle_edit_entry(self):
-        log_debug("Triggered handle_edit_entry")
-        sel = self.tree.selection()
-        if not sel:
-            log_debug("Edit aborted: No selection")
-            messagebox.showwarning("Edit", "None selected")
-            return
-        if len(sel) == 1:
-            keys_order = self.tree.get_children()
-            current_key = sel[0]
-            try:
-                current_index = list(keys_order).index(current_key)
-            except ValueError:
-                log_debug("Edit error: Selected key not found in tree")
-                messagebox.showerror("Edit", "Not found")
-                return
-            log_debug(f"Editing one entry: {current_key} at index {current_index}")
-            d = ExtendedEntryDialog(self, list(keys_order), current_index, self.db)
-            self.wait_window(d)
-            save_db(self.db)
-            self.refresh_list()
-            messagebox.showinfo("Edit", "Updated")
+            cands = self.text
+        return {k for k in cands if value in self.field_text(k, field)}
+
+    def matches(self, key, clause):
+        neg, field, op, value = clause
+        if field in NUMERIC_FIELDS:
+            v = self.values[key][NUMERIC_FIELDS.index(field)]
+            return v is not None and QUERY_OPS[op](v, value)
+        if field is None:
+            return value in self.text[key] or self.in_dir(key, value)
+        return value in self.field_text(key, field)
+
+    def query(self, clauses):
+        """Keys matching every clause from parse_query: the most selective positive clause is looked up in the
+        index and the others, then the negated ones, are checked against its candidates."""
+        positive = sorted((c for c in clauses if not c[0]), key=self.estimate)
+        negative = [c for c in clauses if c[0]]
+        keys = self.candidates(positive[0]) if positive else set(self.text)
+        for clause in positive[1:]:
+            keys = {k for k in keys if self.matches(k, clause)}
+        for clause in negative:
+            keys = {k for k in keys if not self.matches(k, clause)}
+        log_debug("Query plan %s matched %s record(s)", positive + negative, len(keys))
+        return keys
+
+    def search(self, term, within=None):
+        """Keys matching term. within is a previous result set to narrow instead of the whole index,
+        valid when term extends the term that produced it; large sets fall back to the index."""
+        term = term.lower()
+        narrow = within is not None and len(within) * 4 <= len(self.text)
+        if narrow:
+            cands = within
+            hits = {k for k in cands if term in self.text.get(k, "")}
         else:
-            log_debug(f"Editing multiple entries: {sel}")
-            d = MultiEditDialog(self)
-            self.wait_window(d)
-            if d.result:
-                for key in sel:
-                    if key in self.db:
-                        self.db[key].update(d.result)
-                        log_debug(f"Updated record: {key} with {d.result}")
-                    else:
-                        log_error(f"Edit error: {key} not found")
-                        messagebox.showerror("Error", f"{key} not found")
-                save_db(self.db)
-                self.refresh_list()
-                messagebox.showinfo("Edit", "Updated")
+            if len(term) >= 3:
+                cands = self.lookup(self.grams, term)
+            elif re.fullmatch(r"\w+", term):
+                cands = set()
+                for t, keys in self.tokens.items():
+                    if term in t:
+                        cands |= keys
             else:
-                log_debug("MultiEditDialog cancelled or returned no result")
-
-    def handle_delete_entry(self):
-        log_debug("Triggered handle_delete_entry")
-        sel = self.tree.selection()
-        if not sel:
-            log_debug("Delete aborted: No selection")
-            messagebox.showwarning("Delete", "None selected")
-            return
-        if messagebox.askyesno("Delete", "Sure?"):
-            for key in sel:
-                if key in self.db:
-                    log_debug(f"Deleting record: {key}")
-                    self.db.pop(key, None)
-                else:
-                    log_error(f"Delete error: {key} not found")
-            save_db(self.db)
-            self.refresh_list()
-            messagebox.showinfo("Delete", "Deleted")
+                cands = self.text
+            hits = {k for k in cands if term in self.text[k]}
+        if os.sep in term:
+            for d in self.match_dirs(term.rsplit(os.sep, 1)[0]):
+                keys = self.dirs[d] & within if narrow else self.dirs[d]
+                hits.update(k for k in keys if term in k.lower())
         else:
-            log_debug("Delete cancelled by user")
-
-    def handle_open_playme(self):
-        log_debug("Triggered handle_open_playme")
-        sel = self.tree.selection()
-        if not sel:
-            log_debug("PlayMe aborted: No selection")
-            messagebox.showwarning("PlayMe", "None selected")
-            return
-        fps = [self.db[k]["full_path"] for k in sel if k in self.db]
-        if not fps:
-            log_debug("PlayMe error: No valid file paths found for selection")
-            messagebox.showerror("PlayMe", "Not found")
-            return
+            for d in self.match_dirs(term):
+                hits |= self.dirs[d] & within if narrow else self.dirs[d]
+        log_debug("Index search for '%s' checked %s candidate(s), %s hit(s)", term, len(cands), len(hits))
+        return hits
+
+    def save(self, path, signature):
+        log_debug("Saving search index to %s", path)
         try:
-            log_debug(f"Launching PLAYME_SCRIPT with files: {fps}")
-            subprocess.Popen(["python3", PLAYME_SCRIPT] + fps)
-            messagebox.showinfo("PlayMe", "Launched")
+            with open(path + ".tmp", 'wb') as f:
+                pickle.dump((signature, self.__dict__), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
         except Exception as e:
-            log_error(f"Error launching PLAYME_SCRIPT: {e}")
-            messagebox.showerror("PlayMe", f"Error: {e}")
-
-    def handle_save_to_file(self):
-        log_debug("Triggered handle_save_to_file")
-        updated = 0
-        for rec in self.db.values():
-            fp = rec.get("full_path")
-            if not fp or not os.path.isfile(fp):
-                log_error(f"File not found: {fp}")
-                continue
-            try:
-                audio = File(fp, easy=True)
-                if audio is None:
-                    log_error(f"Mutagen could not open file: {fp}")
+            log_error("Error saving search index: %s", e)
+
+    @classmethod
+    def load(cls, path, signature):
+        try:
+            with open(path, 'rb') as f:
+                saved, state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log_error("Error loading search index: %s", e)
+            return None
+        index = cls()
+        if signature is None or saved != signature or set(state) != set(index.__dict__):
+            log_debug("Persisted search index is stale; rebuilding")
+            return None
+        index.__dict__.update(state)
+        log_debug("Search index loaded from %s", path)
+        return index
+
+def discard_posting(index, k, v):
+    vals = index.get(k)
+    if vals is not None:
+        vals.discard(v)
+        if not vals:
+            del index[k]
+
+def load_index(db):
+    if PERSIST_INDEX:
+        index = SearchIndex.load(INDEX_FILENAME, db_signature())
+        if index is not None:
+            return index
+    index = SearchIndex()
+    index.build(db)
+    return index
+
+def sort_key(rec, col):
+    if col == "file_size":
+        try:
+            return int(rec.get("file_size") or 0)
+        except (TypeError, ValueError):
+            return 0
+    return str(rec.get(col, "")).lower()
+
+class SortIndex:
+    """Per-column sorted (key, path) arrays, built on first use and kept in step with the db."""
+    def __init__(self):
+        self.orders = {}
+        self.keys = {}
+
+    def order(self, db, col):
+        if col not in self.orders:
+            log_debug("Building sort order for column: %s", col)
+            self.orders[col] = sorted((sort_key(r, col), k) for k, r in db.items())
+            self.keys[col] = {k: sk for sk, k in self.orders[col]}
+        return self.orders[col]
+
+    def update(self, db, changed=(), removed=()):
+        for col, order in self.orders.items():
+            keys = self.keys[col]
+            for k in [*removed, *changed]:
+                old = keys.pop(k, None)
+                if old is None:
                     continue
-                for tag in ("artist", "title", "album", "tracknumber"):
-                    value = rec.get(tag, "")
-                    if value:
-                        audio[tag] = value
-                        log_debug(f"Set {tag}='{value}' for file: {fp}")
-                audio.save()
-                updated += 1
-            except Exception as e:
-                log_error(f"Error writing metadata to {fp}: {e}")
-        save_db(self.db)
-        self.refresh_list()
-        messagebox.showinfo("Save to File", f"Metadata written to {updated} file(s).")
-        log_debug("Completed metadata save to files.")
-
-    def on_close(self):
-        log_debug("Application close requested")
-        if messagebox.askyesno("Exit", "Sure?"):
-            log_debug("Closing application")
-            self.destroy()
+                i = bisect_left(order, (old, k))
+                if i < len(order) and order[i] == (old, k):
+                    del order[i]
+            for k in changed:
+                if k in db:
+                    sk = sort_key(db[k], col)
+                    insort(order, (sk, k))
+                    keys[k] = sk
+
+    def sorted_keys(self, db, col, reverse=False, subset=None):
+        order = self.order(db, col)
+        if subset is None:
+            keys = [k for _, k in order]
+        elif len(subset) * 8 < len(order):
+            col_keys = self.keys[col]
+            keys = [k for _, k in sorted((col_keys[k], k) for k in subset if k in col_keys)]
         else:
-            log_debug("Close cancelled by user")
+            keys = [k for _, k in order if k in subset]
+        if reverse:
+            keys.reverse()
+        return keys
+
+def scan_search(db, term):
+    term = term.lower()
+    return [k for k, r in db.items()
+            if term in k.lower() or any(term in str(r.get(f, "")).lower() for f in SEARCH_FIELDS)]
+
+def emit(obj):
+    sys.stdout.write(json.dumps(obj, ensure_ascii=False, default=record_json) + "\n")
+
+def cli_import(db, args):
+    for d in args.dirs:
+        changed, removed = [], []
+        summary = import_dir(db, d, args.command == "rescan", getattr(args, "prune", False), IMPORT_WORKERS,
+                             changed=changed, removed=removed)
+        save_db(db, changed, removed)
+        add_root(d)
+        emit({"dir": os.path.abspath(d), **summary})
+
+def cli_search(db, args):
+    index = SearchIndex.load(INDEX_FILENAME, db_signature()) if PERSIST_INDEX else None
+    clauses = parse_query(args.term)
+    if clauses is not None:
+        if index is None:
+            index = SearchIndex()
+            index.build(db)
+        keys = index.query(clauses)
+    else:
+        keys = index.search(args.term) if index else scan_search(db, args.term)
+    for k in sorted(keys):
+        if k in db:
+            emit(db[k])
+
+def cli_stats(db, args):
+    emit({"records": len(db),
+          "artists": len({r.get("artist", "") for r in db.values()}),
+          "albums": len({r.get("album", "") for r in db.values()}),
+          "total_size": sum(int(r.get("file_size") or 0) for r in db.values() if str(r.get("file_size", "")).isdigit()),
+          "dirty": sum(1 for r in db.values() if r.get("dirty"))})
+
+def cli_export(db, args):
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for rec in db.values():
+            out.write(json.dumps(rec, ensure_ascii=False, default=record_json) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def cli_write_tags(db, args):
+    snapshot = {k: dict(r) for k, r in db.items() if r.get("dirty") or args.all}
+    counts = {"written": 0, "unchanged": 0, "failed": 0}
+    changed = []
+    for batch in write_back(list(snapshot.values()), WRITE_WORKERS):
+        changed += apply_write(db, batch, snapshot, counts)
+        for key, status, _ in batch:
+            emit({"full_path": key, "status": status})
+    save_db(db, changed, [])
+    emit(counts)
+
+def cli_verify(db, args):
+    missing = []
+    for batch in verify_library(db, VERIFY_WORKERS):
+        for status, key in batch:
+            emit({"status": status, "full_path": key})
+            if status == "missing":
+                missing.append(key)
+    if args.remove_missing and missing:
+        for key in missing:
+            db.pop(key, None)
+        save_db(db, [], missing)
+        emit({"removed": len(missing)})
+
+def cli_duplicates(db, args):
+    items = {k: (r.get("file_size"), r.get("hashes")) for k, r in db.items()}
+    changed = []
+    for kind, data in find_duplicates(items, HASH_WORKERS):
+        if kind == "hashes":
+            for k, h in data:
+                db[k]["hashes"] = h
+                changed.append(k)
+        else:
+            for group in data:
+                emit({"size": db[group[0]]["hashes"]["size"], "files": group})
+    save_db(db, changed, [])
+
+def main(argv=None):
+    global DB_FILENAME, SQLITE_FILENAME, NDJSON_FILENAME, DB_BACKEND
+    global IMPORT_WORKERS, WRITE_WORKERS, HASH_WORKERS, VERIFY_WORKERS
+    parser = argparse.ArgumentParser(prog="music_manager",
+                                     description="Music catalog manager. Starts the GUI when no command is given.")
+    parser.add_argument("--db", help="catalog file for the selected backend")
+    parser.add_argument("--backend", choices=("json", "ndjson", "sqlite"), help="storage backend")
+    parser.add_argument("--workers", type=int, help="worker threads for import, hashing and tag writing")
+    parser.add_argument("--metrics", metavar="FILE", help="write timing metrics as JSON to FILE on exit")
+    parser.add_argument("--profile", metavar="SPAN", help="cProfile the first run of a timed span, e.g. load_db")
+    sub = parser.add_subparsers(dest="command")
+    for name, text in (("import", "import directories into the catalog"),
+                       ("rescan", "rescan directories, skipping unchanged files")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("dirs", nargs="+")
+        if name == "rescan":
+            p.add_argument("--prune", action="store_true", help="remove entries for files no longer on disk")
+        p.set_defaults(func=cli_import)
+    p = sub.add_parser("search", help="print matching records")
+    p.add_argument("term")
+    p.set_defaults(func=cli_search)
+    sub.add_parser("stats", help="print catalog statistics").set_defaults(func=cli_stats)
+    p = sub.add_parser("export", help="print every record")
+    p.add_argument("-o", "--output", help="write to a file instead of stdout")
+    p.set_defaults(func=cli_export)
+    sub.add_parser("duplicates", help="print groups of duplicate files").set_defaults(func=cli_duplicates)
+    p = sub.add_parser("verify", help="print records whose file is missing or has changed on disk")
+    p.add_argument("--remove-missing", action="store_true", help="remove missing records from the catalog")
+    p.set_defaults(func=cli_verify)
+    p = sub.add_parser("write-tags", help="write dirty records' tags to their files")
+    p.add_argument("--all", action="store_true", help="write every record, not only dirty ones")
+    p.set_defaults(func=cli_write_tags)
+    args = parser.parse_args(argv)
+    if args.backend:
+        DB_BACKEND = args.backend
+    if args.db:
+        if DB_BACKEND == "sqlite":
+            SQLITE_FILENAME = args.db
+        elif DB_BACKEND == "ndjson":
+            NDJSON_FILENAME = args.db
+        else:
+            DB_FILENAME = args.db
+    if args.workers:
+        IMPORT_WORKERS = WRITE_WORKERS = HASH_WORKERS = VERIFY_WORKERS = max(1, args.workers)
+    if PERSIST_META_CACHE:
+        META_CACHE.load(META_CACHE_FILENAME)
+    if args.profile:
+        music_manager_metrics.arm_profile(args.profile)
+    try:
+        if not args.command:
+            from music_manager_gui import MusicDBApp
+            MusicDBApp().mainloop()
+            return 0
+        log_debug("Running command: %s", args.command)
+        try:
+            db = load_db()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            sys.stderr.write(f"Cannot load catalog {db_path()}: {e}\n")
+            return 1
+        try:
+            args.func(db, args)
+        except BrokenPipeError:
+            pass
+        return 0
+    finally:
+        if PERSIST_META_CACHE:
+            META_CACHE.save(META_CACHE_FILENAME)
+        if args.metrics:
+            music_manager_metrics.dump(args.metrics)
 
 if __name__ == "__main__":
-    MusicDBApp().mainloop()
+    # Share this module with music_manager_gui instead of loading it a second time as "music_manager".
+    sys.modules.setdefault("music_manager", sys.modules[__name__])
+    sys.exit(main())
@@ -0,0 +1,220 @@
+# Music Manager benchmarks: generates a synthetic library and times the hot paths.
+import os, sys, json, time, struct, random, argparse, platform, tracemalloc, subprocess
+from datetime import datetime
+import music_manager as mm
+from music_manager_logger import log_debug
+
+RESULTS_FILENAME = "bench_results.jsonl"
+FORMATS = ("mp3", "ogg", "flac")
+WORDS = ("red", "blue", "night", "river", "song", "live", "dream", "stone", "fire", "road", "light", "echo")
+
+def words(rng, n):
+    return " ".join(rng.choice(WORDS).title() for _ in range(n))
+
+def write_mp3(path):
+    frame = b"\xff\xfb\x90\x64" + b"\0" * 413
+    with open(path, 'wb') as f:
+        f.write(frame * 20)
+
+def write_ogg(path):
+    from mutagen.ogg import OggPage
+    pages = []
+    for seq, (packet, pos) in enumerate([(b"OpusHead" + bytes([1, 2]) + struct.pack("<HIhB", 312, 48000, 0, 0), 0),
+                                         (b"OpusTags" + struct.pack("<I", 5) + b"bench" + struct.pack("<I", 0), 0),
+                                         (b"\xfc" + b"\0" * 400, 960)]):
+        page = OggPage()
+        page.packets = [packet]
+        page.serial = 1
+        page.sequence = seq
+        page.position = pos
+        page.first = seq == 0
+        page.last = seq == 2
+        pages.append(page.write())
+    with open(path, 'wb') as f:
+        f.write(b"".join(pages))
+
+def write_flac(path):
+    info = struct.pack(">HH", 4096, 4096) + b"\0" * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, "big") + b"\0" * 16
+    with open(path, 'wb') as f:
+        f.write(b"fLaC" + bytes([0x80, 0, 0, 34]) + info + b"\0" * 4000)
+
+def generate_library(root, count, seed=1):
+    from mutagen import File
+    rng = random.Random(seed)
+    writers = {"mp3": write_mp3, "ogg": write_ogg, "flac": write_flac}
+    paths = []
+    for i in range(count):
+        ext = FORMATS[i % len(FORMATS)]
+        d = os.path.join(root, f"artist{i // 200:04d}", f"album{i // 12:05d}")
+        os.makedirs(d, exist_ok=True)
+        fp = os.path.join(d, f"{i % 12 + 1:02d} track{i:06d}.{ext}")
+        if not os.path.exists(fp):
+            writers[ext](fp)
+            audio = File(fp, easy=True)
+            if audio.tags is None:
+                audio.add_tags()
+            audio["artist"] = f"Artist {i // 200} {words(rng, 1)}"
+            audio["album"] = f"Album {i // 12} {words(rng, 2)}"
+            audio["title"] = words(rng, 3)
+            audio["tracknumber"] = str(i % 12 + 1)
+            audio.save()
+        paths.append(fp)
+    log_debug("Generated synthetic library of %s file(s) in %s", count, root)
+    return paths
+
+def synthetic_catalog(count, root="/music", seed=1):
+    rng = random.Random(seed)
+    db = mm.RecordStore()
+    for i in range(count):
+        fp = os.path.join(root, f"artist{i // 200:04d}", f"album{i // 12:05d}", f"{i % 12 + 1:02d} track{i:07d}.mp3")
+        db[fp] = {"artist": f"Artist {i // 200} {words(rng, 1)}", "title": words(rng, 3),
+                  "album": f"Album {i // 12} {words(rng, 2)}", "tracknumber": str(i % 12 + 1),
+                  "file_size": rng.randint(2_000_000, 12_000_000), "file_name": os.path.basename(fp),
+                  "full_path": fp, "mtime": 1_700_000_000_000_000_000 + i, "inode": 1000 + i}
+    return db
+
+def measure(name, fn, items, memory=True):
+    """Time fn() once, then run it again under tracemalloc for the peak allocation."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    result = {"name": name, "items": items, "seconds": round(elapsed, 4),
+              "per_sec": round(items / elapsed, 1) if elapsed else None}
+    if memory:
+        tracemalloc.start()
+        fn()
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    print(f"  {name:<32} {items:>9} items {elapsed:>9.3f}s {result['per_sec'] or 0:>12.1f}/s"
+          + (f" {result['peak_kb']:>10} KB peak" if memory else ""))
+    return result
+
+def bench_catalog(workdir, count, memory):
+    results = []
+    db = synthetic_catalog(count)
+    mm.DB_FILENAME = os.path.join(workdir, f"catalog_{count}.json")
+    mm.SQLITE_FILENAME = os.path.join(workdir, f"catalog_{count}.sqlite")
+    mm.NDJSON_FILENAME = os.path.join(workdir, f"catalog_{count}.ndjson")
+    for backend in ("json", "ndjson", "sqlite"):
+        mm.DB_BACKEND = backend
+        if backend == "sqlite" and os.path.exists(mm.SQLITE_FILENAME):
+            os.remove(mm.SQLITE_FILENAME)
+        results.append(measure(f"save_db[{backend}]", lambda: mm.save_db(db), count, memory))
+        results.append(measure(f"load_db[{backend}]", mm.load_db, count, memory))
+        key = next(iter(db))
+        results.append(measure(f"save_db[{backend}] one record", lambda: mm.save_db(db, [key], []), 1, memory))
+    mm.DB_BACKEND = "json"
+    index = mm.SearchIndex()
+    results.append(measure("SearchIndex.build", lambda: mm.SearchIndex().build(db), count, memory))
+    index.build(db)
+    queries = ["river", "ni", "album 12", "track00001", "artist0003/", "zzz"]
+    results.append(measure("search_records[index]", lambda: [index.search(q) for q in queries],
+                           len(queries), memory))
+    results.append(measure("search_records[scan]", lambda: [mm.scan_search(db, q) for q in queries],
+                           len(queries), memory))
+    sorter = mm.SortIndex()
+    results.append(measure("sort_by_column[first]", lambda: mm.SortIndex().sorted_keys(db, "title"), count, memory))
+    sorter.sorted_keys(db, "title")
+    results.append(measure("sort_by_column[cached]", lambda: sorter.sorted_keys(db, "title", True), count, memory))
+    results.extend(bench_refresh(count, memory))
+    for r in results:
+        r["scale"] = count
+    return results
+
+def bench_refresh(count, memory):
+    import tkinter as tk
+    from music_manager_gui import MusicDBApp
+    try:
+        app = MusicDBApp()
+    except tk.TclError as e:
+        print(f"  {'refresh_list':<32} skipped: {e}")
+        return []
+    app.withdraw()
+    while app.jobs.running():
+        app.update()
+
+    def refresh():
+        app.refresh_list()
+        while app.render_job:
+            app.update()
+
+    try:
+        return [measure("refresh_list", refresh, count, memory)]
+    finally:
+        app.destroy()
+
+def bench_files(workdir, count, memory):
+    root = os.path.join(workdir, f"library_{count}")
+    start = time.perf_counter()
+    generate_library(root, count)
+    print(f"  generated {count} file(s) in {time.perf_counter() - start:.1f}s")
+    mm.META_CACHE = mm.MetaCache()
+    results = [measure("import_dir", lambda: mm.import_dir({}, root), count, memory)]
+    results.append(measure("import_dir[meta cache]", lambda: mm.import_dir({}, root), count, memory))
+    db = mm.RecordStore()
+    mm.import_dir(db, root)
+    results.append(measure("import_dir[incremental]", lambda: mm.import_dir(db, root, incremental=True),
+                           count, memory))
+    runs = iter(range(1 << 30))
+
+    def write():
+        suffix = f" #{next(runs)}"
+        recs = [dict(r, title=r["title"] + suffix) for r in db.values()]
+        for _ in mm.write_back(recs, mm.WRITE_WORKERS):
+            pass
+
+    results.append(measure("handle_save_to_file[write_back]", write, count, memory))
+    for r in results:
+        r["scale"] = count
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(previous, current):
+    before = {(r["name"], r.get("scale")): r for r in previous["results"]}
+    print(f"\nCompared with {previous['revision']} ({previous['time']}):")
+    for r in current["results"]:
+        old = before.get((r["name"], r.get("scale")))
+        if old and old["seconds"]:
+            change = (r["seconds"] - old["seconds"]) / old["seconds"] * 100
+            print(f"  {r['name']:<32} {r['scale']:>8} {old['seconds']:>9.3f}s -> {r['seconds']:>9.3f}s ({change:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Music Manager on synthetic data.")
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000], help="synthetic catalog sizes")
+    parser.add_argument("--files", type=int, default=300, help="synthetic audio files for import and write-back")
+    parser.add_argument("--workdir", default="/tmp/music_manager_bench", help="where generated data is kept")
+    parser.add_argument("--results", default=RESULTS_FILENAME, help="JSON lines file the run is appended to")
+    parser.add_argument("--compare", action="store_true", help="compare with the previous stored run")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    args = parser.parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+    memory = not args.no_memory
+    results = []
+    for count in args.records:
+        print(f"Catalog of {count} record(s):")
+        results += bench_catalog(args.workdir, count, memory)
+    if args.files:
+        print(f"Library of {args.files} file(s):")
+        results += bench_files(args.workdir, args.files, memory)
+    run = {"time": datetime.now().isoformat(timespec="seconds"), "revision": git_revision(),
+           "python": platform.python_version(), "records": args.records, "files": args.files, "results": results}
+    previous = None
+    if args.compare and os.path.exists(args.results):
+        with open(args.results, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        previous = json.loads(lines[-1]) if lines else None
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + "\n")
+    if previous:
+        compare(previous, run)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
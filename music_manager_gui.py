@@ -0,0 +1,1242 @@
+import os, time, queue, threading, tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from music_manager import (EXTS, IMPORT_WORKERS, WRITE_WORKERS, HASH_WORKERS, TAG_FIELDS, PERSIST_INDEX, INDEX_FILENAME,
+                           save_db, stream_db, parse_query, RecordStore, SearchIndex, extract_meta, add_file,
+                           scan_dir, apply_scan, new_summary, format_summary, write_back, apply_write, db_signature,
+                           load_index, SortIndex, load_roots, add_root, LibraryWatcher, find_duplicates,
+                           verify_library, reimport, VERIFY_WORKERS, WATCH_PRUNE_LIMIT)
+from music_manager_logger import log_error, log_debug
+from music_manager_player import PlayerClient
+import music_manager_metrics
+from music_manager_metrics import span, timed
+
+PLAYME_SCRIPT = "/home/coder/bin/Python/PlayMe/playme.py"
+PLAYER_COMMAND = ["python3", PLAYME_SCRIPT]
+POLL_MS = 100
+RENDER_SLICE_MS = 30
+SEARCH_DELAY_MS = 250
+INCREMENTAL_LIMIT = 2000
+JOB_HISTORY = 50
+
+def format_size(value):
+    try:
+        return f"{int(value or 0)/(1024*1024):.2f} MB"
+    except Exception:
+        return ""
+
+def create_form(frame, fields, init=None):
+    log_debug("Creating form.")
+    entries = {}
+    for idx, (label, key) in enumerate(fields):
+        ttk.Label(frame, text=label).grid(row=idx, column=0, sticky="w", pady=2)
+        ent = ttk.Entry(frame, width=50)
+        ent.grid(row=idx, column=1, sticky="w", pady=2)
+        entries[key] = ent
+        if key == "full_path":
+            ttk.Button(frame, text="Browse", command=lambda e=ent: browse_file(e, entries)).grid(row=idx, column=2, padx=5)
+        if init and key in init:
+            log_debug("Initializing field '%s' with value '%s'", key, init[key])
+            ent.insert(0, str(init[key]))
+    log_debug("Form created.")
+    return entries
+
+def browse_file(path_entry, entries):
+    log_debug("Browsing file...")
+    fp = filedialog.askopenfilename(title="Select", filetypes=[("Audio", "*.mp3 *.ogg *.oga *.flac")])
+    if fp:
+        log_debug("File selected: %s", fp)
+        path_entry.delete(0, tk.END)
+        path_entry.insert(0, fp)
+        entries["file_name"].delete(0, tk.END)
+        entries["file_name"].insert(0, os.path.basename(fp))
+        try:
+            size = os.stat(fp).st_size
+            entries["file_size"].delete(0, tk.END)
+            entries["file_size"].insert(0, size)
+            log_debug("File size for '%s' is %s bytes", fp, size)
+        except Exception as e:
+            log_error("Error for %s: %s", fp, e)
+
+class BaseDialog(tk.Toplevel):
+    def __init__(self, master, title, fields, init=None):
+        log_debug("Initializing BaseDialog titled '%s'", title)
+        super().__init__(master)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(master)
+        self.grab_set()
+        self.result = None
+        frame = ttk.Frame(self)
+        frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.entries = create_form(frame, fields, init)
+        self.btn_frame = ttk.Frame(self)
+        self.btn_frame.pack(pady=10)
+        ttk.Button(self.btn_frame, text="OK", command=self.on_ok).pack(side="left", padx=5)
+        ttk.Button(self.btn_frame, text="Cancel", command=self.destroy).pack(side="left", padx=5)
+        log_debug("BaseDialog initialized.")
+
+    def on_ok(self):
+        log_debug("OK clicked on BaseDialog; processing entries.")
+        self.result = {k: e.get().strip() for k, e in self.entries.items()}
+        if self.result.get("full_path", "").lower().endswith(EXTS):
+            meta = extract_meta(self.result["full_path"])
+            for f in ("artist", "title", "album", "tracknumber"):
+                if not self.result[f]:
+                    self.result[f] = meta[f]
+                    log_debug("Updated field '%s' with metadata: %s", f, meta[f])
+            if not self.result["file_name"]:
+                self.result["file_name"] = os.path.basename(self.result["full_path"])
+                log_debug("Set file_name to %s", self.result['file_name'])
+            if not self.result["file_size"]:
+                try:
+                    self.result["file_size"] = os.stat(self.result["full_path"]).st_size
+                    log_debug("Set file_size to %s", self.result['file_size'])
+                except Exception as e:
+                    log_error("Error getting file size for %s: %s", self.result['full_path'], e)
+                    self.result["file_size"] = ""
+        log_debug("Dialog result: %s", self.result)
+        self.destroy()
+
+class EntryDialog(BaseDialog):
+    def __init__(self, master, title, init=None):
+        log_debug("Initializing EntryDialog titled '%s'", title)
+        fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber"),
+                  ("Size", "file_size"), ("Name", "file_name"), ("Path", "full_path")]
+        super().__init__(master, title, fields, init)
+
+class ExtendedEntryDialog(tk.Toplevel):
+    def __init__(self, master, keys_list, current_index, db):
+        log_debug("Initializing ExtendedEntryDialog")
+        super().__init__(master)
+        self.master = master
+        self.keys_list = keys_list
+        self.current_index = current_index
+        self.db = db
+        self.changed = set()
+        self.removed = set()
+        self.title("Edit Extended")
+        self.resizable(False, False)
+        self.transient(master)
+        self.grab_set()
+        self.result = None
+        self.fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber"),
+                       ("Size", "file_size"), ("Name", "file_name"), ("Path", "full_path")]
+        self.form_frame = ttk.Frame(self)
+        self.form_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.entries = create_form(self.form_frame, self.fields, self.current_record())
+        self.nav_frame = ttk.Frame(self)
+        self.nav_frame.pack(pady=10)
+        ttk.Button(self.nav_frame, text="Previous", command=self.go_previous).pack(side="left", padx=5)
+        ttk.Button(self.nav_frame, text="Save", command=self.save_current).pack(side="left", padx=5)
+        ttk.Button(self.nav_frame, text="Next", command=self.go_next).pack(side="left", padx=5)
+        ttk.Button(self.nav_frame, text="Close", command=self.on_close).pack(side="left", padx=5)
+        log_debug("ExtendedEntryDialog initialized.")
+
+    def current_record(self):
+        key = self.keys_list[self.current_index]
+        log_debug("Fetching current record for key: %s", key)
+        return self.db.get(key, {})
+
+    def update_form(self):
+        rec = self.current_record()
+        log_debug("Updating form with record: %s", rec)
+        for key, entry in self.entries.items():
+            entry.delete(0, tk.END)
+            entry.insert(0, str(rec.get(key, "")))
+
+    def save_current(self):
+        log_debug("Saving current record in ExtendedEntryDialog.")
+        rec = {k: e.get().strip() for k, e in self.entries.items()}
+        if rec.get("full_path", "").lower().endswith(EXTS):
+            meta = extract_meta(rec["full_path"])
+            for f in ("artist", "title", "album", "tracknumber"):
+                if not rec[f]:
+                    rec[f] = meta[f]
+                    log_debug("Auto-filled field '%s' with meta: %s", f, meta[f])
+            if not rec["file_name"]:
+                rec["file_name"] = os.path.basename(rec["full_path"])
+                log_debug("Set file_name: %s", rec['file_name'])
+            if not rec["file_size"]:
+                try:
+                    rec["file_size"] = os.stat(rec["full_path"]).st_size
+                    log_debug("Set file_size: %s", rec['file_size'])
+                except Exception as e:
+                    log_error("Error getting file size %s: %s", rec['full_path'], e)
+                    rec["file_size"] = ""
+        current_key = self.keys_list[self.current_index]
+        new_key = rec.get("full_path")
+        if new_key and new_key != current_key:
+            self.db.pop(current_key, None)
+            rec["dirty"] = True
+            self.db[new_key] = rec
+            self.keys_list[self.current_index] = new_key
+            self.changed.discard(current_key)
+            self.removed.add(current_key)
+            self.removed.discard(new_key)
+            self.changed.add(new_key)
+            log_debug("Updated record key: replaced %s with %s", current_key, new_key)
+        else:
+            old = self.db.get(current_key, {})
+            if any(rec[t] != str(old.get(t, "")) for t in TAG_FIELDS):
+                rec["dirty"] = True
+            for k, v in old.items():
+                rec.setdefault(k, v)
+            self.db[current_key] = rec
+            self.changed.add(current_key)
+            log_debug("Saved record for key: %s", current_key)
+        messagebox.showinfo("Save", "Saved.")
+
+    def go_previous(self):
+        log_debug("Navigating to previous record.")
+        if self.current_index == 0:
+            messagebox.showinfo("Navigation", "1st record.")
+            log_debug("Already at first record; cannot go previous.")
+            return
+        self.save_current()
+        self.current_index -= 1
+        self.update_form()
+        log_debug("Moved to record index: %s", self.current_index)
+
+    def go_next(self):
+        log_debug("Navigating to next record.")
+        if self.current_index == len(self.keys_list) - 1:
+            messagebox.showinfo("Navigation", "Last record.")
+            log_debug("Already at last record; cannot go next.")
+            return
+        self.save_current()
+        self.current_index += 1
+        self.update_form()
+        log_debug("Moved to record index: %s", self.current_index)
+
+    def on_close(self):
+        log_debug("Closing ExtendedEntryDialog; saving current record.")
+        self.save_current()
+        self.destroy()
+
+class MultiEditDialog(BaseDialog):
+    def __init__(self, master):
+        log_debug("Initializing MultiEditDialog")
+        fields = [("Artist", "artist"), ("Title", "title"), ("Album", "album"), ("Tracknumber", "tracknumber")]
+        super().__init__(master, "Multi-Edit", fields)
+
+    def on_ok(self):
+        log_debug("OK clicked on MultiEditDialog; processing entries.")
+        self.result = {k: e.get().strip() for k, e in self.entries.items() if e.get().strip()}
+        log_debug("MultiEditDialog result: %s", self.result)
+        self.destroy()
+
+class DuplicatesDialog(tk.Toplevel):
+    def __init__(self, master, groups):
+        log_debug("Initializing DuplicatesDialog with %s group(s)", len(groups))
+        super().__init__(master)
+        self.master = master
+        self.title("Duplicates")
+        self.geometry("900x500")
+        self.transient(master)
+        cont = ttk.Frame(self)
+        cont.pack(fill="both", expand=True, padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(cont, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
+        cols = ("artist", "title", "album", "file_size")
+        self.tree = ttk.Treeview(cont, columns=cols, show="tree headings", selectmode="extended",
+                                 yscrollcommand=scrollbar.set)
+        self.tree.heading("#0", text="File")
+        self.tree.column("#0", width=400, anchor="w")
+        for col in cols:
+            self.tree.heading(col, text=col.replace("_", " ").title())
+            self.tree.column(col, width=100, anchor="w")
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.config(command=self.tree.yview)
+        for idx, group in enumerate(groups, 1):
+            parent = self.tree.insert("", tk.END, text=f"Group {idx} ({len(group)} files)", open=True)
+            for key in group:
+                r = master.db.get(key, {})
+                self.tree.insert(parent, tk.END, iid=key, text=key,
+                                 values=(r.get("artist", ""), r.get("title", ""), r.get("album", ""),
+                                         format_size(r.get("file_size"))))
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Remove from Catalog", command=self.remove_selected).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Delete Files",
+                   command=lambda: self.remove_selected(delete_files=True)).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side="left", padx=5)
+        log_debug("DuplicatesDialog initialized.")
+
+    def remove_selected(self, delete_files=False):
+        keys = [k for k in self.tree.selection() if self.tree.parent(k)]
+        if not keys:
+            messagebox.showwarning("Duplicates", "None selected", parent=self)
+            return
+        groups = {self.tree.parent(k) for k in keys}
+        if delete_files and any(set(self.tree.get_children(p)) <= set(keys) for p in groups):
+            messagebox.showwarning("Duplicates", "Keep at least one file of each group", parent=self)
+            return
+        action = "Delete" if delete_files else "Remove"
+        if not messagebox.askyesno("Duplicates", f"{action} {len(keys)} file(s)?", parent=self):
+            log_debug("Duplicate removal cancelled by user")
+            return
+        removed = []
+        try:
+            for key in keys:
+                if delete_files:
+                    try:
+                        os.remove(key)
+                        log_debug("Deleted duplicate file: %s", key)
+                    except OSError as e:
+                        log_error("Error deleting %s: %s", key, e)
+                        messagebox.showerror("Duplicates", f"Error: {e}", parent=self)
+                        continue
+                if self.master.db.pop(key, None) is not None:
+                    removed.append(key)
+                if not self.tree.exists(key):
+                    continue
+                parent = self.tree.parent(key)
+                self.tree.delete(key)
+                if len(self.tree.get_children(parent)) < 2:
+                    self.tree.delete(parent)
+        finally:
+            self.master.apply_changes(removed=removed)
+
+class VerifyDialog(tk.Toplevel):
+    def __init__(self, master, found):
+        log_debug("Initializing VerifyDialog with %s stale entr(ies)", len(found))
+        super().__init__(master)
+        self.master = master
+        self.title("Verify Library")
+        self.geometry("900x500")
+        self.transient(master)
+        cont = ttk.Frame(self)
+        cont.pack(fill="both", expand=True, padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(cont, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
+        cols = ("artist", "title", "album", "file_size")
+        self.tree = ttk.Treeview(cont, columns=cols, show="tree headings", selectmode="extended",
+                                 yscrollcommand=scrollbar.set)
+        self.tree.heading("#0", text="File")
+        self.tree.column("#0", width=400, anchor="w")
+        for col in cols:
+            self.tree.heading(col, text=col.replace("_", " ").title())
+            self.tree.column(col, width=100, anchor="w")
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.config(command=self.tree.yview)
+        for status in ("missing", "changed"):
+            keys = sorted(k for st, k in found if st == status)
+            if not keys:
+                continue
+            parent = self.tree.insert("", tk.END, iid=f"#{status}", text=f"{status.title()} ({len(keys)} files)",
+                                      open=True)
+            for key in keys:
+                r = master.db.get(key, {})
+                self.tree.insert(parent, tk.END, iid=key, text=key,
+                                 values=(r.get("artist", ""), r.get("title", ""), r.get("album", ""),
+                                         format_size(r.get("file_size"))))
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Remove from Catalog", command=self.remove_selected).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Re-import", command=self.reimport_selected).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side="left", padx=5)
+        log_debug("VerifyDialog initialized.")
+
+    def selected_keys(self):
+        keys = []
+        for iid in self.tree.selection():
+            keys.extend(self.tree.get_children(iid) if not self.tree.parent(iid) else [iid])
+        return list(dict.fromkeys(keys))
+
+    def drop_rows(self, keys):
+        for key in keys:
+            if self.tree.exists(key):
+                parent = self.tree.parent(key)
+                self.tree.delete(key)
+                if not self.tree.get_children(parent):
+                    self.tree.delete(parent)
+
+    def remove_selected(self):
+        keys = self.selected_keys()
+        if not keys:
+            messagebox.showwarning("Verify Library", "None selected", parent=self)
+            return
+        if not messagebox.askyesno("Verify Library", f"Remove {len(keys)} entr(ies) from the catalog?", parent=self):
+            log_debug("Stale entry removal cancelled by user")
+            return
+        removed = [k for k in keys if self.master.db.pop(k, None) is not None]
+        self.drop_rows(keys)
+        self.master.apply_changes(removed=removed)
+
+    def reimport_selected(self):
+        keys = self.selected_keys()
+        if not keys:
+            messagebox.showwarning("Verify Library", "None selected", parent=self)
+            return
+        if self.master.start_reimport(keys):
+            self.drop_rows(keys)
+
+class JobScheduler:
+    """Runs jobs on worker threads and hands their batches back to Tk through one queue polled with after().
+
+    on_batch and on_done always run on the Tk thread, so every db mutation is serialized there while the
+    window stays free for browsing and searching. Only one job per title runs at a time.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.queue = queue.Queue()
+        self.jobs = []
+        self.next_id = 1
+        self.polling = False
+
+    def running(self):
+        return [j for j in self.jobs if j["status"] in ("running", "cancelling")]
+
+    def start(self, title, work, on_batch=None, on_done=None, metric=None, cancellable=True):
+        if any(j["title"] == title for j in self.running()):
+            log_debug("%s refused: already running", title)
+            messagebox.showwarning(title, "Busy")
+            return None
+        job = {"id": self.next_id, "title": title, "cancel": threading.Event(), "progress": {"found": 0, "done": 0},
+               "changed": [], "removed": [], "status": "running", "started": time.perf_counter(), "elapsed": None,
+               "cancellable": cancellable, "on_batch": on_batch, "on_done": on_done}
+        self.next_id += 1
+        self.jobs.append(job)
+
+        def run():
+            try:
+                with span(metric or f"job.{title}"):
+                    for batch in work(job):
+                        self.queue.put((job, batch))
+            except Exception as e:
+                log_error("%s failed: %s", title, e)
+                job["error"] = e
+            finally:
+                self.queue.put((job, None))
+
+        threading.Thread(target=run, daemon=True).start()
+        log_debug("Started job #%s: %s", job["id"], title)
+        if not self.polling:
+            self.polling = True
+            self.app.after(POLL_MS, self.poll)
+        self.app.show_jobs()
+        return job
+
+    def poll(self):
+        deadline = time.perf_counter() + RENDER_SLICE_MS / 1000
+        try:
+            while time.perf_counter() < deadline:
+                job, batch = self.queue.get_nowait()
+                try:
+                    if batch is None:
+                        self.finish(job)
+                    elif job["on_batch"]:
+                        job["on_batch"](job, batch)
+                except Exception as e:
+                    log_error("Job #%s %s callback failed: %s", job["id"], job["title"], e)
+                    if batch is not None:
+                        job.setdefault("error", e)
+                        job["cancel"].set()
+        except queue.Empty:
+            pass
+        finally:
+            try:
+                self.app.show_jobs()
+            finally:
+                if self.running() or not self.queue.empty():
+                    self.app.after(POLL_MS, self.poll)
+                else:
+                    self.polling = False
+
+    def finish(self, job):
+        job["elapsed"] = time.perf_counter() - job["started"]
+        job["status"] = "failed" if job.get("error") else "cancelled" if job["cancel"].is_set() else "done"
+        log_debug("Job #%s %s %s in %.3fs", job["id"], job["title"], job["status"], job["elapsed"])
+        finished = [j for j in self.jobs if j["status"] not in ("running", "cancelling")]
+        if len(finished) > JOB_HISTORY:
+            old = {j["id"] for j in finished[:-JOB_HISTORY]}
+            self.jobs[:] = [j for j in self.jobs if j["id"] not in old]
+        if job["on_done"]:
+            job["on_done"](job)
+
+    def cancel(self, job):
+        if job["cancellable"] and job["status"] == "running":
+            log_debug("Cancelling job #%s: %s", job["id"], job["title"])
+            job["cancel"].set()
+            job["status"] = "cancelling"
+            self.app.show_jobs()
+
+    def cancel_all(self):
+        for job in self.running():
+            self.cancel(job)
+
+class JobsDialog(tk.Toplevel):
+    def __init__(self, master):
+        log_debug("Initializing JobsDialog")
+        super().__init__(master)
+        self.scheduler = master.jobs
+        self.title("Jobs")
+        self.geometry("600x300")
+        self.transient(master)
+        cols = ("status", "progress", "time")
+        self.tree = ttk.Treeview(self, columns=cols, show="tree headings", selectmode="extended")
+        self.tree.heading("#0", text="Job")
+        self.tree.column("#0", width=220, anchor="w")
+        for col in cols:
+            self.tree.heading(col, text=col.title())
+            self.tree.column(col, width=110, anchor="w")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=10)
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(pady=(0, 10))
+        ttk.Button(btn_frame, text="Cancel Selected", command=self.cancel_selected).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side="left", padx=5)
+        self.refresh_job = None
+        self.refresh()
+
+    def destroy(self):
+        if self.refresh_job:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        super().destroy()
+
+    def refresh(self):
+        now = time.perf_counter()
+        ids = set()
+        for job in reversed(self.scheduler.jobs):
+            iid = str(job["id"])
+            ids.add(iid)
+            p = job["progress"]
+            elapsed = job["elapsed"] if job["elapsed"] is not None else now - job["started"]
+            values = (job["status"], f"{p['done']}/{p['found']}", f"{elapsed:.1f}s")
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert("", 0, iid=iid, text=f"#{job['id']} {job['title']}", values=values)
+        for iid in self.tree.get_children():
+            if iid not in ids:
+                self.tree.delete(iid)
+        self.refresh_job = self.after(500, self.refresh)
+
+    def cancel_selected(self):
+        for job in self.scheduler.jobs:
+            if str(job["id"]) in self.tree.selection():
+                self.scheduler.cancel(job)
+
+class DiagnosticsDialog(tk.Toplevel):
+    def __init__(self, master):
+        log_debug("Initializing DiagnosticsDialog")
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.geometry("800x500")
+        self.transient(master)
+        cols = ("count", "total", "mean", "p50", "p95", "max")
+        self.tree = ttk.Treeview(self, columns=cols, show="tree headings", height=12)
+        self.tree.heading("#0", text="Span")
+        self.tree.column("#0", width=220, anchor="w")
+        for col in cols:
+            self.tree.heading(col, text=col if col == "count" else f"{col} (ms)")
+            self.tree.column(col, width=90, anchor="e")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(fill="x", padx=10)
+        self.profile_name = tk.StringVar()
+        ttk.Label(btn_frame, text="Profile next:").pack(side="left")
+        self.profile_box = ttk.Combobox(btn_frame, textvariable=self.profile_name, width=24)
+        self.profile_box.pack(side="left", padx=2)
+        for txt, cmd in [("Arm", self.arm_profile), ("Dump JSON", self.dump_json), ("Reset", self.reset),
+                         ("Close", self.destroy)]:
+            ttk.Button(btn_frame, text=txt, command=cmd).pack(side="left", padx=2)
+        self.profile_text = tk.Text(self, height=10, wrap="none", font=("TkFixedFont", 9))
+        self.profile_text.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        self.shown_profile = None
+        self.refresh_job = None
+        self.refresh()
+
+    def destroy(self):
+        if self.refresh_job:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        super().destroy()
+
+    def refresh(self):
+        if self.refresh_job:
+            self.after_cancel(self.refresh_job)
+        stats = music_manager_metrics.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, m in stats.items():
+            self.tree.insert("", tk.END, text=name, values=(m["count"], *(f"{m[k] * 1000:.2f}" for k in
+                                                                        ("total", "mean", "p50", "p95", "max"))))
+        self.profile_box.config(values=list(stats))
+        profile = music_manager_metrics.last_profile
+        if profile is not self.shown_profile:
+            self.shown_profile = profile
+            self.profile_text.delete("1.0", tk.END)
+            self.profile_text.insert(tk.END, f"{profile['name']} at {profile['time']} "
+                                             f"({profile.get('path', 'not saved')})\n{profile['stats']}")
+        self.refresh_job = self.after(1000, self.refresh)
+
+    def arm_profile(self):
+        name = self.profile_name.get().strip()
+        if not name:
+            messagebox.showwarning("Diagnostics", "Pick a span", parent=self)
+            return
+        music_manager_metrics.arm_profile(name)
+        self.profile_text.delete("1.0", tk.END)
+        self.profile_text.insert(tk.END, f"Waiting for next '{name}'...")
+
+    def dump_json(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Save Metrics", defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            music_manager_metrics.dump(path)
+
+    def reset(self):
+        music_manager_metrics.reset()
+        self.refresh()
+
+class MusicDBApp(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        try:
+            icon = tk.PhotoImage(file="/home/coder/bin/Python/Music_Manager/music_manager_icon.png")
+            self.iconphoto(False, icon)
+        except Exception as e:
+            log_error("Failed to load icon: %s", e)
+        log_debug("Initializing MusicDBApp")
+        self.title("Music Manager")
+        self.geometry("1000x600")
+        self.db = RecordStore()
+        self.index = SearchIndex()
+        self.sorter = SortIndex()
+        self.sort_info = {"column": None, "reverse": False}
+        self.jobs = JobScheduler(self)
+        self.render_job = None
+        self.stripe_job = None
+        self.stripe_span = None
+        self.view_keys = []
+        self.filtered = False
+        self.watch = None
+        self.player = PlayerClient(PLAYER_COMMAND)
+        self.watch_var = tk.BooleanVar(value=False)
+        self.search_text = tk.StringVar()
+        self.search_job = None
+        self.last_search = None
+        self.locked = []
+        self.create_widgets()
+        self.search_text.trace_add("write", self.schedule_search)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.start_load()
+
+    def create_widgets(self):
+        log_debug("Creating widgets")
+        s = ttk.Style(self)
+        s.theme_use("clam")
+        s.configure("Treeview", background="black", foreground="white", fieldbackground="black", font=("TkDefaultFont", 11))
+        s.configure("Treeview.Heading", background="grey20", foreground="white")
+        
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill="x", padx=5, pady=5)
+        for (txt, cmd) in [("Import Directory", self.handle_import_directory),
+                           ("Rescan Directory", self.handle_rescan_directory),
+                           ("Add File", self.handle_add_file),
+                           ("Add Manually", self.handle_add_entry),
+                           ("Edit", self.handle_edit_entry),
+                           ("Delete", self.handle_delete_entry),
+                           ("Duplicates", self.handle_find_duplicates),
+                           ("Verify", self.handle_verify_library),
+                           ("PlayMe", self.handle_open_playme),
+                           ("Queue", lambda: self.handle_open_playme(enqueue=True)),
+                           ("Stop", self.handle_stop_playme),
+                           ("Refresh", self.refresh_list),
+                           ("Diagnostics", lambda: DiagnosticsDialog(self)),
+                           ("Save to File", self.handle_save_to_file),
+                           ("Close", self.on_close)]:
+            log_debug("Adding toolbar button: %s", txt)
+            b = ttk.Button(toolbar, text=txt, command=cmd)
+            b.pack(side="left", padx=2)
+            if txt not in ("PlayMe", "Queue", "Stop", "Refresh", "Diagnostics", "Close"):
+                self.locked.append(b)
+        cb = ttk.Checkbutton(toolbar, text="Watch", variable=self.watch_var, command=self.toggle_watch)
+        cb.pack(side="left", padx=2)
+        self.locked.append(cb)
+
+        s_frame = ttk.Frame(self)
+        s_frame.pack(fill="x", padx=5, pady=(0,5))
+        ttk.Label(s_frame, text="Search:").pack(side="left")
+        se = ttk.Entry(s_frame, textvariable=self.search_text, width=40)
+        se.pack(side="left", padx=2)
+        se.bind("<Return>", lambda e: self.search_records())
+        self.locked.append(se)
+        for txt, cmd in [("Search", self.search_records), ("Clear Search", self.clear_search)]:
+            log_debug("Adding search toolbar button: %s", txt)
+            b = ttk.Button(s_frame, text=txt, command=cmd)
+            b.pack(side="left", padx=2)
+            self.locked.append(b)
+        
+        cont = ttk.Frame(self)
+        cont.pack(fill="both", expand=True, padx=5, pady=5)
+        scrollbar = ttk.Scrollbar(cont, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
+        cols = ("artist", "title", "album", "tracknumber", "file_size", "file_name", "full_path")
+        self.tree = ttk.Treeview(cont, columns=cols, show="headings", selectmode="extended", yscrollcommand=scrollbar.set)
+        for col in cols:
+            self.tree.heading(col, text=col.replace("_", " ").title(), command=lambda c=col: self.sort_by_column(c))
+            self.tree.column(col, width=100, anchor="w")
+            log_debug("Configured tree column: %s", col)
+        self.tree.tag_configure("odd", background="black")
+        self.tree.tag_configure("even", background="grey20")
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.config(command=self.tree.yview)
+        self.total_label = ttk.Label(self, text="Total Files: 0")
+        self.total_label.pack(side="bottom", pady=5)
+        self.progress_frame = ttk.Frame(self)
+        self.progress_label = ttk.Label(self.progress_frame, text="")
+        self.progress_label.pack(side="left", padx=5)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode="determinate", length=300)
+        self.progress_bar.pack(side="left", padx=5, fill="x", expand=True)
+        ttk.Button(self.progress_frame, text="Jobs", command=lambda: JobsDialog(self)).pack(side="left", padx=5)
+        ttk.Button(self.progress_frame, text="Cancel", command=self.jobs.cancel_all).pack(side="left", padx=5)
+        log_debug("Widgets created, refreshing list")
+        self.refresh_list()
+
+    def start_load(self):
+        log_debug("Loading catalog in the background")
+        for w in self.locked:
+            w.state(["disabled"])
+        started = time.perf_counter()
+
+        def on_batch(task, batch):
+            first = not self.db
+            self.db.update(batch)
+            if first and self.db:
+                log_debug("First %s record(s) parsed after %.3fs", len(self.db), time.perf_counter() - started)
+                self.refresh_list()
+            self.total_label.config(text=f"Total Files: {len(self.db)}")
+
+        def on_done(task):
+            self.sorter = SortIndex()
+            if task.get("error"):
+                self.refresh_list()
+                messagebox.showerror("Load", f"Error: {task['error']}")
+                return
+            log_debug("Database loaded with %s records in %.3fs", len(self.db), time.perf_counter() - started)
+            self.index = load_index(self.db)
+            for w in self.locked:
+                w.state(["!disabled"])
+            self.refresh_list()
+
+        self.jobs.start("Loading", lambda job: stream_db(job["progress"]), on_batch, on_done, "load_db",
+                        cancellable=False)
+
+    @timed("refresh_list")
+    def refresh_list(self, keys=None):
+        log_debug("Refreshing list")
+        if self.render_job:
+            self.after_cancel(self.render_job)
+            self.render_job = None
+        if self.stripe_job:
+            self.after_cancel(self.stripe_job)
+            self.stripe_job = None
+        self.tree.delete(*self.tree.get_children())
+        col = self.sort_info["column"] or "artist"
+        log_debug("Sorting list by column: %s with reverse=%s", col, self.sort_info['reverse'])
+        self.filtered = keys is not None
+        keys = self.sorter.sorted_keys(self.db, col, self.sort_info["reverse"], keys)
+        self.view_keys = [k for k in keys if k in self.db]
+        self.render_started = time.perf_counter()
+        self.render_rows(self.view_keys, 0)
+        self.total_label.config(text=f"Total Files: {len(self.db)}")
+        log_debug("Total files displayed: %s", len(self.db))
+
+    def row_values(self, r):
+        return (r["artist"], r["title"], r["album"], r["tracknumber"], format_size(r.get("file_size")),
+                r["file_name"], r["full_path"])
+
+    def render_rows(self, keys, start):
+        deadline = time.perf_counter() + RENDER_SLICE_MS / 1000
+        idx = start
+        while idx < len(keys):
+            self.tree.insert("", tk.END, iid=keys[idx], values=self.row_values(self.db[keys[idx]]),
+                             tags=("even" if idx % 2 == 0 else "odd",))
+            idx += 1
+            if idx % 100 == 0 and time.perf_counter() > deadline:
+                break
+        if idx < len(keys):
+            self.render_job = self.after(1, self.render_rows, keys, idx)
+        else:
+            self.render_job = None
+            music_manager_metrics.record("refresh_list.render", time.perf_counter() - self.render_started)
+            log_debug("Rendered %s row(s)", len(keys))
+
+    def view_filter(self):
+        return set(self.view_keys) if self.filtered else None
+
+    def update_rows(self, changed=(), removed=()):
+        """Patch only the affected rows: move or insert changed keys at their sorted position, delete removed ones,
+        and restripe just the span that shifted. Selection and the top visible row are kept."""
+        if self.render_job:
+            self.refresh_list(self.view_filter())
+            return
+        col = self.sort_info["column"] or "artist"
+        reverse = self.sort_info["reverse"]
+        self.sorter.order(self.db, col)
+        col_keys = self.sorter.keys[col]
+        affected = set(removed) | set(changed)
+        selection = self.tree.selection()
+        top = self.tree.yview()[0]
+        size = len(self.view_keys)
+        anchor = self.view_keys[min(int(top * size), size - 1)] if size else None
+        old = [i for i, k in enumerate(self.view_keys) if k in affected]
+        shown = {self.view_keys[i] for i in old}
+        if shown:
+            self.view_keys = [k for k in self.view_keys if k not in affected]
+            self.tree.detach(*shown)
+        positions = []
+        for k in dict.fromkeys(changed):
+            if k not in self.db or (self.filtered and k not in shown):
+                continue
+            target = (col_keys[k], k)
+            lo, hi = 0, len(self.view_keys)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                m = self.view_keys[mid]
+                if ((col_keys[m], m) < target) != reverse:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            self.view_keys.insert(lo, k)
+            if k in shown:
+                self.tree.move(k, "", lo)
+                self.tree.item(k, values=self.row_values(self.db[k]))
+                shown.discard(k)
+            else:
+                self.tree.insert("", lo, iid=k, values=self.row_values(self.db[k]))
+            positions.append(lo)
+        if shown:
+            self.tree.delete(*shown)
+        if old or positions:
+            new = [i for i, k in enumerate(self.view_keys) if k in affected] if positions else []
+            first = min(old + positions)
+            end = max(old + new) + 1 if len(self.view_keys) == size else None
+            self.restripe(first, end)
+        self.tree.selection_set([k for k in selection if self.tree.exists(k) and k in self.db])
+        if anchor in self.db and anchor not in affected and self.view_keys:
+            self.tree.yview_moveto(self.view_keys.index(anchor) / len(self.view_keys))
+        else:
+            self.tree.yview_moveto(top)
+        self.total_label.config(text=f"Total Files: {len(self.db)}")
+        log_debug("Updated rows in place: %s changed, %s removed", len(changed), len(removed))
+
+    def restripe(self, start, end=None):
+        """Re-tag rows start..end (None for the rest of the list) in time slices, merging with any pending span."""
+        if self.stripe_job:
+            self.after_cancel(self.stripe_job)
+            self.stripe_job = None
+            pending_start, pending_end = self.stripe_span
+            start = min(start, pending_start)
+            end = None if end is None or pending_end is None else max(end, pending_end)
+        deadline = time.perf_counter() + RENDER_SLICE_MS / 1000
+        idx = start
+        while idx < (len(self.view_keys) if end is None else min(end, len(self.view_keys))):
+            self.tree.item(self.view_keys[idx], tags=("even" if idx % 2 == 0 else "odd",))
+            idx += 1
+            if idx % 100 == 0 and time.perf_counter() > deadline:
+                self.stripe_span = (idx, end)
+                self.stripe_job = self.after(1, self.restripe_pending)
+                return
+
+    def restripe_pending(self):
+        self.stripe_job = None
+        self.restripe(*self.stripe_span)
+
+    def apply_changes(self, changed=(), removed=()):
+        log_debug("Applying changes: %s changed, %s removed", len(changed), len(removed))
+        self.last_search = None
+        save_db(self.db, list(changed), list(removed))
+        self.index.update(self.db, changed, removed)
+        self.sorter.update(self.db, changed, removed)
+        if len(changed) + len(removed) <= INCREMENTAL_LIMIT:
+            self.update_rows(changed, removed)
+        else:
+            self.refresh_list(self.view_filter())
+
+    def toggle_watch(self):
+        if not self.watch_var.get():
+            if self.watch:
+                log_debug("Stopping library watcher")
+                self.watch["cancel"].set()
+                self.watch = None
+            return
+        roots = load_roots()
+        if not roots:
+            log_debug("Watch refused: no imported roots recorded")
+            self.watch_var.set(False)
+            messagebox.showwarning("Watch", "No imported directories to watch.")
+            return
+        q = queue.Queue()
+        self.watch = {"cancel": threading.Event(), "queue": q}
+        watcher = LibraryWatcher(roots)
+        threading.Thread(target=watcher.run, args=(self.db, self.watch["cancel"], q.put), daemon=True).start()
+        log_debug("Started library watcher on %s", roots)
+        self.after(POLL_MS, self.poll_watch, self.watch)
+
+    def poll_watch(self, watch):
+        if watch is not self.watch:
+            return
+        batches = []
+        try:
+            while True:
+                batches.append(watch["queue"].get_nowait())
+        except queue.Empty:
+            pass
+        missing = sum(1 for batch in batches for status, _, _ in batch if status == "missing")
+        prune = missing <= WATCH_PRUNE_LIMIT or messagebox.askyesno(
+            "Watch", f"{missing} watched file(s) are gone from disk.\n\nRemove them from the catalog?")
+        changed, removed = [], []
+        summary = new_summary()
+        for batch in batches:
+            c, r = apply_scan(self.db, batch, summary, prune)
+            changed += c
+            removed += r
+        if changed or removed:
+            log_debug("Watcher applied changes: %s", summary)
+            self.apply_changes(changed, removed)
+        self.after(POLL_MS * 10, self.poll_watch, watch)
+
+    def sort_by_column(self, col):
+        log_debug("Sorting by column: %s", col)
+        if self.sort_info["column"] == col:
+            self.sort_info["reverse"] = not self.sort_info["reverse"]
+            log_debug("Toggled sort order for '%s'. Reverse now: %s", col, self.sort_info['reverse'])
+        else:
+            self.sort_info = {"column": col, "reverse": False}
+            log_debug("Switched sort column to: %s", col)
+        self.refresh_list(self.view_filter())
+
+    def schedule_search(self, *args):
+        if self.search_job:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self.search_records)
+
+    @timed("search_records")
+    def search_records(self):
+        if self.search_job:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+        term = self.search_text.get().strip().lower()
+        log_debug("Searching records for term: '%s'", term)
+        if not term:
+            log_debug("Empty search term; displaying all records")
+            self.last_search = None
+            self.refresh_list()
+            return
+        last = self.last_search
+        if last and last[0] == term and self.filtered:
+            log_debug("Search term unchanged; keeping current results")
+            return
+        clauses = parse_query(term)
+        if clauses is not None:
+            filtered = self.index.query(clauses)
+        else:
+            plain = last and last[0] in term and parse_query(last[0]) is None
+            filtered = self.index.search(term, last[1] if plain else None)
+        self.last_search = (term, filtered)
+        log_debug("Found %s records matching '%s'", len(filtered), term)
+        self.refresh_list(filtered)
+
+    def clear_search(self):
+        log_debug("Clearing search criteria")
+        self.search_text.set("")
+        self.search_records()
+
+    def handle_import_directory(self):
+        log_debug("Triggered handle_import_directory")
+        d = filedialog.askdirectory(title="Select Directory")
+        if d:
+            log_debug("Directory selected for import: %s", d)
+            self.start_import(d, "Import")
+        else:
+            log_debug("No directory selected for import")
+
+    def handle_rescan_directory(self):
+        log_debug("Triggered handle_rescan_directory")
+        d = filedialog.askdirectory(title="Select Directory")
+        if not d:
+            log_debug("No directory selected for rescan")
+            return
+        prune = messagebox.askyesnocancel("Rescan", "Remove entries for files no longer on disk?")
+        if prune is None:
+            log_debug("Rescan cancelled by user")
+            return
+        log_debug("Directory selected for rescan: %s", d)
+        self.start_import(d, "Rescan", incremental=True, prune=prune)
+
+    def start_import(self, d, title, incremental=False, prune=False):
+        summary = new_summary()
+        add_root(d)
+
+        def on_batch(task, batch):
+            changed, removed = apply_scan(self.db, batch, summary, prune)
+            task["changed"].extend(changed)
+            task["removed"].extend(removed)
+
+        def on_done(task):
+            log_debug("%s finished; now %s records: %s", task["title"], len(self.db), summary)
+            if summary["added"] or summary["updated"] or summary["removed"]:
+                self.apply_changes(task["changed"], task["removed"])
+            if task.get("error"):
+                messagebox.showerror(task["title"], f"Error: {task['error']}\n\n{format_summary(summary)}")
+                return
+            status = "Cancelled" if task["cancel"].is_set() else "Completed"
+            messagebox.showinfo(task["title"], f"{status}\n\n{format_summary(summary)}")
+
+        log_debug("Starting %s of %s with %s worker(s)", title.lower(), d, IMPORT_WORKERS)
+        self.jobs.start(title, lambda task: scan_dir(self.db, d, incremental, IMPORT_WORKERS, task["cancel"],
+                                                     task["progress"]), on_batch, on_done, "import_dir")
+
+    def show_jobs(self):
+        running = self.jobs.running()
+        if not running:
+            self.progress_frame.pack_forget()
+            return
+        job = running[0]
+        p = job["progress"]
+        more = f" (+{len(running) - 1} more)" if len(running) > 1 else ""
+        state = "cancelling..." if job["status"] == "cancelling" else f"{p['done']}/{p['found']}"
+        self.progress_bar.config(maximum=max(p["found"], 1), value=p["done"])
+        self.progress_label.config(text=f"{job['title']}: {state}{more}")
+        if not self.progress_frame.winfo_ismapped():
+            self.progress_frame.pack(side="bottom", fill="x", padx=5, before=self.total_label)
+
+    def handle_add_file(self):
+        log_debug("Triggered handle_add_file")
+        fp = filedialog.askopenfilename(title="Select", filetypes=[("Audio", "*.mp3 *.ogg *.oga *.flac")])
+        if fp:
+            log_debug("File selected for addition: %s", fp)
+            add_file(self.db, fp)
+            self.apply_changes(changed=[os.path.abspath(fp)])
+            messagebox.showinfo("Add", f"File '{os.path.basename(fp)}' added")
+        else:
+            log_debug("No file selected in handle_add_file")
+
+    def handle_add_entry(self):
+        log_debug("Triggered handle_add_entry")
+        d = EntryDialog(self, "Add New")
+        self.wait_window(d)
+        if d.result and d.result.get("full_path"):
+            log_debug("New entry added with full_path: %s", d.result['full_path'])
+            d.result["dirty"] = True
+            self.db[d.result["full_path"]] = d.result
+            self.apply_changes(changed=[d.result["full_path"]])
+            messagebox.showinfo("Add", "Added")
+        else:
+            log_debug("Add entry failed: 'full_path' missing or dialog cancelled")
+            messagebox.showerror("Error", "Full Path")
+
+    def handle_edit_entry(self):
+        log_debug("Triggered handle_edit_entry")
+        sel = self.tree.selection()
+        if not sel:
+            log_debug("Edit aborted: No selection")
+            messagebox.showwarning("Edit", "None selected")
+            return
+        if len(sel) == 1:
+            keys_order = self.view_keys
+            current_key = sel[0]
+            try:
+                current_index = keys_order.index(current_key)
+            except ValueError:
+                log_debug("Edit error: Selected key not found in tree")
+                messagebox.showerror("Edit", "Not found")
+                return
+            log_debug("Editing one entry: %s at index %s", current_key, current_index)
+            d = ExtendedEntryDialog(self, list(keys_order), current_index, self.db)
+            self.wait_window(d)
+            self.apply_changes(d.changed, d.removed)
+            messagebox.showinfo("Edit", "Updated")
+        else:
+            log_debug("Editing multiple entries: %s", sel)
+            d = MultiEditDialog(self)
+            self.wait_window(d)
+            if d.result:
+                for key in sel:
+                    if key in self.db:
+                        if any(self.db[key].get(k) != v for k, v in d.result.items()):
+                            self.db[key].update(d.result, dirty=True)
+                        log_debug("Updated record: %s with %s", key, d.result)
+                    else:
+                        log_error("Edit error: %s not found", key)
+                        messagebox.showerror("Error", f"{key} not found")
+                self.apply_changes(changed=[key for key in sel if key in self.db])
+                messagebox.showinfo("Edit", "Updated")
+            else:
+                log_debug("MultiEditDialog cancelled or returned no result")
+
+    def handle_delete_entry(self):
+        log_debug("Triggered handle_delete_entry")
+        sel = self.tree.selection()
+        if not sel:
+            log_debug("Delete aborted: No selection")
+            messagebox.showwarning("Delete", "None selected")
+            return
+        if messagebox.askyesno("Delete", "Sure?"):
+            removed = []
+            for key in sel:
+                if key in self.db:
+                    log_debug("Deleting record: %s", key)
+                    self.db.pop(key, None)
+                    removed.append(key)
+                else:
+                    log_error("Delete error: %s not found", key)
+            self.apply_changes(removed=removed)
+            messagebox.showinfo("Delete", "Deleted")
+        else:
+            log_debug("Delete cancelled by user")
+
+    def handle_find_duplicates(self):
+        log_debug("Triggered handle_find_duplicates")
+        items = {k: (r.get("file_size"), r.get("hashes")) for k, r in self.db.items()}
+        result = {"groups": []}
+
+        def on_batch(task, batch):
+            kind, data = batch
+            if kind == "groups":
+                result["groups"] = data
+                return
+            for key, hashes in data:
+                if key in self.db:
+                    self.db[key]["hashes"] = hashes
+                    task["changed"].append(key)
+
+        def on_done(task):
+            if task["changed"]:
+                save_db(self.db, task["changed"], [])
+            if task.get("error"):
+                messagebox.showerror("Duplicates", f"Error: {task['error']}")
+                return
+            if task["cancel"].is_set():
+                messagebox.showinfo("Duplicates", "Cancelled")
+                return
+            groups = [[k for k in g if k in self.db] for g in result["groups"]]
+            groups = [g for g in groups if len(g) > 1]
+            log_debug("Duplicate scan found %s group(s)", len(groups))
+            if not groups:
+                messagebox.showinfo("Duplicates", "No duplicates found.")
+                return
+            DuplicatesDialog(self, groups)
+
+        self.jobs.start("Duplicates", lambda task: find_duplicates(items, HASH_WORKERS, task["cancel"], task["progress"]),
+                        on_batch, on_done, "find_duplicates")
+
+    def handle_verify_library(self):
+        log_debug("Triggered handle_verify_library")
+        found = []
+
+        def on_done(task):
+            if task.get("error"):
+                messagebox.showerror("Verify Library", f"Error: {task['error']}")
+                return
+            if task["cancel"].is_set():
+                messagebox.showinfo("Verify Library", "Cancelled")
+                return
+            found[:] = [(st, k) for st, k in found if k in self.db]
+            log_debug("Verify found %s stale entr(ies)", len(found))
+            if not found:
+                messagebox.showinfo("Verify Library", "All entries match their files.")
+                return
+            VerifyDialog(self, found)
+
+        self.jobs.start("Verify Library", lambda task: verify_library(dict(self.db), VERIFY_WORKERS, task["cancel"],
+                                                                      task["progress"]),
+                        lambda task, batch: found.extend(batch), on_done, "verify_library")
+
+    def start_reimport(self, keys):
+        summary = new_summary()
+
+        def on_batch(task, batch):
+            changed, removed = apply_scan(self.db, batch, summary)
+            task["changed"].extend(changed)
+            task["removed"].extend(removed)
+
+        def on_done(task):
+            if task["changed"] or task["removed"]:
+                self.apply_changes(task["changed"], task["removed"])
+            if task.get("error"):
+                messagebox.showerror("Re-import", f"Error: {task['error']}")
+            else:
+                messagebox.showinfo("Re-import", format_summary(summary))
+
+        return self.jobs.start("Re-import", lambda task: reimport(keys, IMPORT_WORKERS, task["cancel"],
+                                                                  task["progress"]),
+                               on_batch, on_done, "reimport")
+
+    def handle_open_playme(self, enqueue=False):
+        log_debug("Triggered handle_open_playme (enqueue=%s)", enqueue)
+        sel = self.tree.selection()
+        if not sel:
+            log_debug("PlayMe aborted: No selection")
+            messagebox.showwarning("PlayMe", "None selected")
+            return
+        fps = [self.db[k]["full_path"] for k in sel if k in self.db]
+        if not fps:
+            log_debug("PlayMe error: No valid file paths found for selection")
+            messagebox.showerror("PlayMe", "Not found")
+            return
+        log_debug("Sending %s file(s) to the player host", len(fps))
+        self.start_player_job("Queue" if enqueue else "PlayMe",
+                              lambda: self.player.enqueue(fps) if enqueue else self.player.play(fps))
+
+    def handle_stop_playme(self):
+        log_debug("Triggered handle_stop_playme")
+        self.start_player_job("Stop", self.player.stop)
+
+    def start_player_job(self, title, send):
+        def work(job):
+            send()
+            return ()
+
+        def on_done(job):
+            if job.get("error"):
+                messagebox.showerror("PlayMe", f"Error: {job['error']}")
+
+        self.jobs.start(title, work, on_done=on_done, metric="player", cancellable=False)
+
+    def handle_save_to_file(self):
+        log_debug("Triggered handle_save_to_file")
+        only_dirty = messagebox.askyesnocancel("Save to File", "Write only modified records?\n\nNo writes every record.")
+        if only_dirty is None:
+            log_debug("Save to file cancelled by user")
+            return
+        snapshot = {k: dict(r) for k, r in self.db.items() if r.get("dirty") or not only_dirty}
+        if not snapshot:
+            log_debug("Save to file: no modified records")
+            messagebox.showinfo("Save to File", "No modified records.")
+            return
+        counts = {"written": 0, "unchanged": 0, "failed": 0}
+
+        def on_batch(task, batch):
+            task["changed"].extend(apply_write(self.db, batch, snapshot, counts))
+
+        def on_done(task):
+            if task["changed"]:
+                self.apply_changes(task["changed"])
+            if task.get("error"):
+                messagebox.showerror("Save to File", f"Error: {task['error']}")
+                return
+            status = "Cancelled" if task["cancel"].is_set() else "Completed"
+            messagebox.showinfo("Save to File", f"{status}\n\nMetadata written to {counts['written']} file(s).\n"
+                                f"Already up to date: {counts['unchanged']}\nFailed: {counts['failed']}")
+            log_debug("Completed metadata save to files: %s", counts)
+
+        log_debug("Writing tags for %s record(s) with %s worker(s)", len(snapshot), WRITE_WORKERS)
+        self.jobs.start("Save to File", lambda task: write_back(list(snapshot.values()), WRITE_WORKERS,
+                                                                task["cancel"], task["progress"]), on_batch, on_done,
+                        "handle_save_to_file")
+
+    def on_close(self):
+        log_debug("Application close requested")
+        if messagebox.askyesno("Exit", "Sure?"):
+            log_debug("Closing application")
+            if self.watch:
+                self.watch["cancel"].set()
+            self.player.close()
+            if PERSIST_INDEX and not self.jobs.running():
+                self.index.save(INDEX_FILENAME, db_signature())
+            self.destroy()
+        else:
+            log_debug("Close cancelled by user")
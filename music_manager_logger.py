@@ -1,37 +1,105 @@
-import logging
+import atexit, logging, os, queue, sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_DIR = os.environ.get("MUSIC_MANAGER_LOG_DIR", "/home/coder/bin/Python/Music_Manager/logs")
+DEFAULT_LOG_LEVEL = "DEBUG"
+DEFAULT_SAMPLE_EVERY = 100
+LOG_LEVEL = os.environ.get("MUSIC_MANAGER_LOG_LEVEL", DEFAULT_LOG_LEVEL).upper()
+try:
+    LOG_SAMPLE_EVERY = int(os.environ.get("MUSIC_MANAGER_LOG_SAMPLE_EVERY", DEFAULT_SAMPLE_EVERY))
+except ValueError:
+    print(f"Invalid MUSIC_MANAGER_LOG_SAMPLE_EVERY {os.environ['MUSIC_MANAGER_LOG_SAMPLE_EVERY']!r}, "
+          f"using {DEFAULT_SAMPLE_EVERY}", file=sys.stderr)
+    LOG_SAMPLE_EVERY = DEFAULT_SAMPLE_EVERY
 
 current_date = datetime.now().strftime('%Y-%m-%d')
-error_log_file = f'/home/coder/bin/Python/Music_Manager/logs/log_error_music_manager_{current_date}.log'
-debug_log_file = f'/home/coder/bin/Python/Music_Manager/logs/log_debug_music_manager_{current_date}.log'
+error_log_file = None
+debug_log_file = None
 
 logger = logging.getLogger('app_logger')
-logger.setLevel(logging.DEBUG)
+logger.propagate = False
 
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S')
 
-error_handler = logging.FileHandler(error_log_file, mode='a', encoding='utf-8')
-error_handler.setLevel(logging.ERROR)
-error_handler.setFormatter(formatter)
-logger.addHandler(error_handler)
+listener = None
+sample_counts = {}
+
+def file_handler(path, level):
+    """Open path now rather than on the first record, so an unwritable log directory is caught here
+    instead of killing the listener thread; falls back to stderr."""
+    try:
+        handler = logging.FileHandler(path, mode='a', encoding='utf-8')
+    except Exception as e:
+        print(f"Failed to open log file {path}: {e}", file=sys.stderr)
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
+def configure(log_dir=None, level=None, sample_every=None):
+    global LOG_DIR, LOG_LEVEL, LOG_SAMPLE_EVERY, error_log_file, debug_log_file, listener
+    LOG_DIR = log_dir or LOG_DIR
+    LOG_LEVEL = (level or LOG_LEVEL).upper()
+    if not isinstance(logging.getLevelName(LOG_LEVEL), int):
+        print(f"Invalid log level {LOG_LEVEL!r}, using {DEFAULT_LOG_LEVEL}", file=sys.stderr)
+        LOG_LEVEL = DEFAULT_LOG_LEVEL
+    LOG_SAMPLE_EVERY = max(1, sample_every or LOG_SAMPLE_EVERY)
+    shutdown()
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"Failed to create log directory {LOG_DIR}: {e}", file=sys.stderr)
+    error_log_file = os.path.join(LOG_DIR, f'log_error_music_manager_{current_date}.log')
+    debug_log_file = os.path.join(LOG_DIR, f'log_debug_music_manager_{current_date}.log')
+    handlers = [file_handler(error_log_file, logging.ERROR)]
+    if logging.getLevelName(LOG_LEVEL) == logging.DEBUG:
+        handlers.append(file_handler(debug_log_file, logging.DEBUG))
+    fallbacks = [h for h in handlers if not isinstance(h, logging.FileHandler)]
+    if len(fallbacks) > 1:
+        handlers = [h for h in handlers if h not in fallbacks[:-1]]
+    q = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(q))
+    logger.setLevel(LOG_LEVEL)
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
 
-debug_handler = logging.FileHandler(debug_log_file, mode='a', encoding='utf-8')
-debug_handler.setLevel(logging.DEBUG)
-debug_handler.setFormatter(formatter)
-logger.addHandler(debug_handler)
+def shutdown():
+    global listener
+    if listener:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+        listener = None
 
-def log_error(message):
+def log_error(message, *args):
     try:
-        logger.error(message)
+        logger.error(message, *args)
     except IOError as e:
-        print(f"Failed to log error to {error_log_file}: {e}")
+        print(f"Failed to log error to {error_log_file}: {e}", file=sys.stderr)
     except Exception as e:
-        print(f"An unexpected error occurred while logging: {e}")
+        print(f"An unexpected error occurred while logging: {e}", file=sys.stderr)
 
-def log_debug(message):
+def log_debug(message, *args):
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     try:
-        logger.debug(message)
+        logger.debug(message, *args)
     except IOError as e:
-        print(f"Failed to log debug message to {debug_log_file}: {e}")
+        print(f"Failed to log debug message to {debug_log_file}: {e}", file=sys.stderr)
     except Exception as e:
-        print(f"An unexpected error occurred while logging: {e}")
+        print(f"An unexpected error occurred while logging: {e}", file=sys.stderr)
+
+def log_sampled(key, message, *args):
+    """Debug-log only every LOG_SAMPLE_EVERY-th message for key, for per-item lines in hot loops."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    n = sample_counts.get(key, 0)
+    sample_counts[key] = n + 1
+    if n % LOG_SAMPLE_EVERY == 0:
+        log_debug(f"[{key} #{n + 1}, 1 in {LOG_SAMPLE_EVERY}] {message}", *args)
+
+configure()
+atexit.register(shutdown)
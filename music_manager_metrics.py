@@ -0,0 +1,128 @@
+import cProfile, io, json, os, pstats, sys, threading, time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from music_manager_logger import log_error, log_debug
+
+DEFAULT_METRICS_WINDOW = 2000
+try:
+    METRICS_WINDOW = max(1, int(os.environ.get("MUSIC_MANAGER_METRICS_WINDOW", DEFAULT_METRICS_WINDOW)))
+except ValueError:
+    print(f"Invalid MUSIC_MANAGER_METRICS_WINDOW {os.environ['MUSIC_MANAGER_METRICS_WINDOW']!r}, "
+          f"using {DEFAULT_METRICS_WINDOW}", file=sys.stderr)
+    METRICS_WINDOW = DEFAULT_METRICS_WINDOW
+PROFILE_DIR = os.environ.get("MUSIC_MANAGER_PROFILE_DIR", "/home/coder/bin/Python/Music_Manager/profiles")
+
+lock = threading.Lock()
+metrics = {}
+profile_armed = None
+profile_active = False
+last_profile = None
+
+def record(name, seconds):
+    """Add one duration to name's stats; percentiles come from the last METRICS_WINDOW samples."""
+    with lock:
+        m = metrics.get(name)
+        if m is None:
+            m = metrics[name] = {"count": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=METRICS_WINDOW)}
+        m["count"] += 1
+        m["total"] += seconds
+        if seconds > m["max"]:
+            m["max"] = seconds
+        m["recent"].append(seconds)
+
+class span:
+    """Time a block (with span("name"):) and record it; also runs cProfile if that name is armed."""
+    __slots__ = ("name", "start", "profiler")
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        if profile_armed is not None:
+            self.profiler = start_profile(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        if self.profiler:
+            stop_profile(self.name, self.profiler)
+        return False
+
+def timed(name):
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+def snapshot():
+    with lock:
+        items = [(name, m["count"], m["total"], m["max"], sorted(m["recent"])) for name, m in metrics.items()]
+    return {name: {"count": count, "total": round(total, 6), "mean": round(total / count, 6) if count else 0.0,
+                   "p50": round(percentile(recent, 50), 6), "p95": round(percentile(recent, 95), 6),
+                   "max": round(peak, 6)}
+            for name, count, total, peak, recent in sorted(items)}
+
+def dump(path=None):
+    data = json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "metrics": snapshot()}, indent=2)
+    if path:
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            log_debug("Metrics written to %s", path)
+        except OSError as e:
+            log_error("Error writing metrics to %s: %s", path, e)
+    return data
+
+def reset():
+    with lock:
+        metrics.clear()
+
+def arm_profile(name):
+    """Profile the next span called name (None disarms), on the thread that runs it.
+    Its stats go to PROFILE_DIR and last_profile."""
+    global profile_armed
+    profile_armed = name
+    log_debug("cProfile armed for next '%s'", name)
+
+def start_profile(name):
+    global profile_armed, profile_active
+    with lock:
+        if profile_armed != name or profile_active:
+            return None
+        profile_armed = None
+        profile_active = True
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        log_error("Could not start cProfile for %s: %s", name, e)
+        profile_active = False
+        return None
+    return profiler
+
+def stop_profile(name, profiler):
+    global profile_active, last_profile
+    profiler.disable()
+    profile_active = False
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+    last_profile = {"name": name, "time": datetime.now().isoformat(timespec="seconds"), "stats": out.getvalue()}
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        last_profile["path"] = path
+        log_debug("cProfile of %s saved to %s", name, path)
+    except OSError as e:
+        log_error("Error saving profile of %s: %s", name, e)
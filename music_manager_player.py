@@ -0,0 +1,175 @@
+# Music Manager player host: one long-lived process that queues selections and runs the configured player once
+# per play/enqueue command with all its files (split every PLAYER_BATCH files to stay within argv limits).
+# Commands arrive as JSON lines on stdin: {"cmd": "play"|"enqueue", "files": [...]}, {"cmd": "stop"}, {"cmd": "quit"}.
+# Events go out as JSON lines on stdout: {"event": "playing"|"finished"|"stopped"|"error", ...}.
+import os, sys, json, threading, subprocess
+from collections import deque
+from music_manager_logger import log_error, log_debug
+
+STOP_TIMEOUT = 2.0
+PLAYER_BATCH = 500
+
+class PlayerHost:
+    def __init__(self, command):
+        self.command = command
+        self.queue = deque()
+        self.current = None
+        self.lock = threading.Lock()
+        self.out_lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        with self.out_lock:
+            try:
+                sys.stdout.write(json.dumps(dict(fields, event=event)) + "\n")
+                sys.stdout.flush()
+            except (BrokenPipeError, ValueError):
+                pass
+
+    def advance(self):
+        while self.current is None and self.queue:
+            files = self.queue.popleft()
+            try:
+                self.current = subprocess.Popen(self.command + files, stdin=subprocess.DEVNULL)
+            except OSError as e:
+                log_error("Player could not start %s file(s) from %s: %s", len(files), files[0], e)
+                self.emit("error", files=files, error=str(e))
+                continue
+            log_debug("Player started %s file(s) from %s (pid %s), %s batch(es) queued",
+                      len(files), files[0], self.current.pid, len(self.queue))
+            self.emit("playing", files=files, queued=len(self.queue))
+            threading.Thread(target=self.watch, args=(self.current, files), daemon=True).start()
+
+    def watch(self, proc, files):
+        code = proc.wait()
+        with self.lock:
+            if proc is not self.current:
+                return
+            self.current = None
+            self.emit("finished", files=files, code=code)
+            self.advance()
+
+    def add(self, files):
+        for i in range(0, len(files), PLAYER_BATCH):
+            self.queue.append(files[i:i + PLAYER_BATCH])
+
+    def stop(self):
+        self.queue.clear()
+        proc, self.current = self.current, None
+        if proc and proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.emit("stopped")
+
+    def handle(self, msg):
+        cmd = msg.get("cmd")
+        files = [f for f in msg.get("files", ()) if isinstance(f, str)]
+        with self.lock:
+            if cmd == "play":
+                self.stop()
+                self.add(files)
+            elif cmd == "enqueue":
+                self.add(files)
+            elif cmd in ("stop", "quit"):
+                self.stop()
+            else:
+                log_error("Player host got unknown command: %s", msg)
+                return
+            log_debug("Player host handled %s with %s file(s)", cmd, len(files))
+            self.advance()
+
+    def run(self, stream):
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                msg = json.loads(line)
+            except ValueError as e:
+                log_error("Player host got bad command line %r: %s", line, e)
+                continue
+            self.handle(msg)
+            if msg.get("cmd") == "quit":
+                return
+        with self.lock:
+            self.stop()
+
+class PlayerClient:
+    """Keeps one PlayerHost subprocess alive and sends it commands over its stdin, restarting it if it has died."""
+    def __init__(self, command):
+        self.command = list(command)
+        self.proc = None
+        self.now_playing = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.proc is not None:
+            log_error("Player host exited with %s; restarting", self.proc.returncode)
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--"] + self.command,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        threading.Thread(target=self.read_events, args=(self.proc,), daemon=True).start()
+        log_debug("Player host started (pid %s): %s", self.proc.pid, self.command)
+
+    def read_events(self, proc):
+        for line in proc.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("event") == "playing":
+                self.now_playing = (event.get("files") or [None])[0]
+            elif event.get("event") in ("stopped", "finished"):
+                self.now_playing = None
+            log_debug("Player event: %s", event)
+
+    def send(self, cmd, files=()):
+        line = json.dumps({"cmd": cmd, "files": list(files)}) + "\n"
+        with self.lock:
+            for attempt in (1, 2):
+                if self.proc is None or self.proc.poll() is not None:
+                    self.start()
+                try:
+                    self.proc.stdin.write(line)
+                    self.proc.stdin.flush()
+                    return
+                except (BrokenPipeError, OSError) as e:
+                    log_error("Player host pipe failed (attempt %s): %s", attempt, e)
+                    self.proc.kill()
+                    self.proc.wait()
+            raise OSError("Player host is not accepting commands")
+
+    def play(self, files):
+        self.send("play", files)
+
+    def enqueue(self, files):
+        self.send("enqueue", files)
+
+    def stop(self):
+        self.send("stop")
+
+    def close(self):
+        with self.lock:
+            proc, self.proc = self.proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.write(json.dumps({"cmd": "quit"}) + "\n")
+            proc.stdin.close()
+            proc.wait(STOP_TIMEOUT + 1)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log_error("Player host did not quit cleanly: %s", e)
+            proc.kill()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[1:] if argv[:1] == ["--"] else argv
+    if not command:
+        sys.stderr.write("usage: music_manager_player.py -- PLAYER [ARGS...]\n")
+        return 2
+    log_debug("Player host running: %s", command)
+    PlayerHost(command).run(sys.stdin)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())